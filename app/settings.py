@@ -35,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,12 +73,22 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': os.environ.get('DB_ENGINE', 'core.db.backends.mysql'),
         'NAME': os.environ.get("DB_NAME"),
         'USER': os.environ.get("DB_USER"),
         'PASSWORD': os.environ.get("DB_PASSWORD"),
         'HOST': os.environ.get("DB_HOST"),
         'PORT': os.environ.get("DB_PORT"),
+        # With the pooled engines, closing a connection returns it to the
+        # pool, so 0 hands it back at the end of every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        },
     }
     # 'default': {
     #     'ENGINE': 'django.db.backends.sqlite3',
@@ -83,6 +96,81 @@ DATABASES = {
     # }
 }
 
+# Read replicas, as a comma separated list of hosts sharing the primary's
+# credentials. Safe requests read from them, see core.db.routers.
+DB_REPLICA_HOSTS = [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host]
+
+for index, host in enumerate(DB_REPLICA_HOSTS):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'POOL': dict(DATABASES['default']['POOL']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Extra shards for recipe data, as comma separated hosts and/or database
+# names; a missing host or name is taken from the default database. Shard 0
+# is the default database, see core.sharding.
+DB_SHARD_HOSTS = [host for host in os.environ.get('DB_SHARD_HOSTS', '').split(',') if host]
+DB_SHARD_NAMES = [name for name in os.environ.get('DB_SHARD_NAMES', '').split(',') if name]
+
+for index in range(max(len(DB_SHARD_HOSTS), len(DB_SHARD_NAMES))):
+    DATABASES[f'shard_{index + 1}'] = {
+        **DATABASES['default'],
+        'HOST': DB_SHARD_HOSTS[index] if index < len(DB_SHARD_HOSTS) else DATABASES['default']['HOST'],
+        'NAME': DB_SHARD_NAMES[index] if index < len(DB_SHARD_NAMES) else DATABASES['default']['NAME'],
+        'POOL': dict(DATABASES['default']['POOL']),
+    }
+
+DATABASE_ROUTERS = ['core.db.routers.ShardRouter', 'core.db.routers.ReplicaRouter']
+
+SHARDING = {
+    'ALIASES': ['default'] + [alias for alias in DATABASES if alias.startswith('shard_')],
+    # Shards new users are placed on, all of them by default.
+    'OPEN': [
+        int(index) for index in os.environ.get('DB_SHARD_OPEN', '').split(',') if index
+    ] or list(range(1 + max(len(DB_SHARD_HOSTS), len(DB_SHARD_NAMES)))),
+    'CACHE_TIMEOUT': int(os.environ.get('DB_SHARD_CACHE_TIMEOUT', 300)),
+    # Holds the users' shards and moves; must be shared by every process,
+    # ideally Redis or Memcached whose counters are atomic.
+    'CACHE_ALIAS': os.environ.get('DB_SHARD_CACHE_ALIAS', 'default'),
+    # Ids of sharded rows reserved at a time by each process.
+    'ID_BLOCK_SIZE': int(os.environ.get('DB_SHARD_ID_BLOCK_SIZE', 100)),
+    # Seconds a move waits for the user's writes in progress.
+    'MOVE_TIMEOUT': int(os.environ.get('DB_SHARD_MOVE_TIMEOUT', 30)),
+}
+
+DB_REPLICA_MAX_LAG_SECONDS = int(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 10))
+DB_REPLICA_CHECK_INTERVAL = int(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+
+READ_REPLICAS = {
+    'ALIASES': [f'replica_{index}' for index in range(len(DB_REPLICA_HOSTS))],
+    # Outlasts the lag a replica may reach before its next health check, so a
+    # client that wrote reads the primary until every replica has its write
+    # (core.E003).
+    'STICKY_SECONDS': int(os.environ.get(
+        'DB_REPLICA_STICKY_SECONDS', DB_REPLICA_MAX_LAG_SECONDS + DB_REPLICA_CHECK_INTERVAL,
+    )),
+    'MAX_LAG_SECONDS': DB_REPLICA_MAX_LAG_SECONDS,
+    'CHECK_INTERVAL': DB_REPLICA_CHECK_INTERVAL,
+    # Holds read-your-writes pins; must be shared by every worker (core.E002).
+    'CACHE_ALIAS': os.environ.get('DB_REPLICA_CACHE_ALIAS', 'default'),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -131,8 +219,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.timing.TimedJSONRenderer',
+        'core.timing.TimedBrowsableAPIRenderer',
+    ],
+}
+
+TOKEN_AUTH_CACHE = {
+    # Off until CACHE_ALIAS names a cache shared by every worker (core.E005),
+    # or revoked tokens stay valid in the other workers for TTL seconds.
+    'ENABLED': bool(int(os.environ.get('TOKEN_AUTH_CACHE_ENABLED', 0))),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    # Shared cache holding the generations that invalidate entries in
+    # every worker, see core.authentication.
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS', 'default'),
+}
+
+RESPONSE_CACHE = {
+    # Off until ALIAS names a cache shared by every worker (core.E004), since
+    # writes invalidate cached lists through it.
+    'ENABLED': bool(int(os.environ.get('RESPONSE_CACHE_ENABLED', 0))),
+    'ALIAS': os.environ.get('RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+REQUEST_TIMING = {
+    'ENABLED': bool(int(os.environ.get('REQUEST_TIMING_ENABLED', 1))),
+}
+
+# Every worker process only counts its own requests, so more than one
+# WORKERS needs DIR to report them all, see core.checks. /api/metrics/ is
+# served to staff users and to requests bearing TOKEN.
+METRICS = {
+    'DIR': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+    'WORKERS': int(os.environ.get('WEB_CONCURRENCY', 1)),
+}
+
+# The slow query log lives in CACHE_ALIAS, which must be shared between
+# processes when it is enabled, see core.checks.
+SLOW_QUERIES = {
+    'ENABLED': bool(int(os.environ.get('SLOW_QUERIES_ENABLED', 0))),
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERIES_THRESHOLD_MS', 200)),
+    'EXPLAIN': bool(int(os.environ.get('SLOW_QUERIES_EXPLAIN', 0))),
+    'MAX_ENTRIES': int(os.environ.get('SLOW_QUERIES_MAX_ENTRIES', 100)),
+    'CACHE_ALIAS': os.environ.get('SLOW_QUERIES_CACHE_ALIAS', 'default'),
+}
+
+PROFILER = {
+    'ENABLED': bool(int(os.environ.get('PROFILER_ENABLED', 1))),
+    'DIR': os.environ.get('PROFILER_DIR'),
+    'MAX_AGE': int(os.environ.get('PROFILER_TOKEN_MAX_AGE', 3600)),
+    'SAMPLE_INTERVAL': float(os.environ.get('PROFILER_SAMPLE_INTERVAL', 0.001)),
+}
+
+MEMORY_TRACING = {
+    'SAMPLE_RATE': float(os.environ.get('MEMORY_TRACING_SAMPLE_RATE', 0)),
+    'FRAMES': int(os.environ.get('MEMORY_TRACING_FRAMES', 1)),
+    'TOP_SITES': int(os.environ.get('MEMORY_TRACING_TOP_SITES', 10)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'WARNING' if DEBUG else 'INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 SPECTACULAR_SETTINGS = {
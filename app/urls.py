@@ -6,15 +6,23 @@ from django.conf.urls.static import static
 from django.conf import settings
 
 from core import views as core_views
+from core.admin import slow_queries_view
 
 
 urlpatterns = [
+    path(
+        'admin/slow-queries/',
+        admin.site.admin_view(slow_queries_view),
+        name='admin-slow-queries',
+    ),
     path('admin/', admin.site.urls),
     path('api/health-check/', core_views.health_check, name='health-check'),
+    path('api/metrics/', core_views.metrics, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('api/async/recipe/', include('recipe.async_urls')),
 ]
 
 if settings.DEBUG:
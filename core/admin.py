@@ -1,11 +1,14 @@
 """
 Django admin customization.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.slow_queries import slow_query_log
 
 
 class UserAdmin(BaseUserAdmin):
@@ -48,3 +51,14 @@ admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
+
+
+def slow_queries_view(request):
+    """List the captured slow queries to staff."""
+    context = {
+        **admin.site.each_context(request),
+        'title': _('Slow queries'),
+        'entries': slow_query_log.entries(),
+        'threshold_ms': settings.SLOW_QUERIES['THRESHOLD_MS'],
+    }
+    return TemplateResponse(request, 'admin/slow_queries.html', context)
@@ -0,0 +1,169 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token keys to tokens, with a time to live.
+
+    Each entry remembers its user's generation, kept in a shared cache.
+    Signal handlers bump the generation when a token or user changes, so
+    every worker drops its stale entries on their next lookup. Changes
+    made with QuerySet.update() send no signals and must call
+    invalidate_user() themselves. Cached users are marked with
+    from_token_cache and must be reloaded before they are saved. Nothing
+    is cached unless TOKEN_AUTH_CACHE['ENABLED'] is set.
+    """
+    prefix = 'token-auth'
+
+    def __init__(self, max_size=1024, ttl=60, alias='default'):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, user_id):
+        return f'{self.prefix}:gen:{user_id}'
+
+    def get_generation(self, user_id):
+        """Return the current generation of a user's entries."""
+        key = self._generation_key(user_id)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Start from the clock so an evicted generation is never reused.
+            self.cache.add(key, time.time_ns(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def get(self, key):
+        """Return a copy of the cached token for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._discard(key)
+                entry = None
+        if entry is not None and self.cache.get(self._generation_key(entry[1].user_id)) != entry[2]:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._discard(key)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        token = self._copy(entry[1])
+        token.user.from_token_cache = True
+        return token
+
+    def set(self, key, token):
+        """Cache token under key, evicting the least recently used entry."""
+        token = self._copy(token)
+        generation = self.get_generation(token.user_id)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, token, generation)
+            self._keys_by_user.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        """Drop the entry for a token key."""
+        with self._lock:
+            self._discard(key)
+
+    def invalidate_user(self, user_id):
+        """Drop a user's entries here and bump their generation now and after commit."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+        if not settings.TOKEN_AUTH_CACHE['ENABLED']:
+            return
+        self._bump(user_id)
+        transaction.on_commit(lambda: self._bump(user_id))
+
+    def _bump(self, user_id):
+        try:
+            self.cache.incr(self._generation_key(user_id))
+        except ValueError:
+            self.cache.add(self._generation_key(user_id), time.time_ns(), timeout=None)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[1].user_id)
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[1].user_id]
+
+    @staticmethod
+    def _copy(token):
+        """Copy token and user so callers never share cached instances."""
+        user = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = user
+        return token
+
+
+def _build_token_cache():
+    options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+    return TokenCache(
+        max_size=options.get('MAX_SIZE', 1024),
+        ttl=options.get('TTL', 60),
+        alias=options.get('CACHE_ALIAS', 'default'),
+    )
+
+
+token_cache = _build_token_cache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches token to user lookups."""
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        """Return the user and token for key, from the cache when possible."""
+        if not settings.TOKEN_AUTH_CACHE['ENABLED']:
+            return super().authenticate_credentials(key)
+        token = self.cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            self.cache.set(key, token)
+        return (token.user, token)
@@ -0,0 +1,326 @@
+"""
+In-process benchmark runners for the API endpoints.
+"""
+import asyncio
+import itertools
+import json
+import math
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from recipe.cache import response_cache
+
+
+@dataclass
+class Endpoint:
+    """A request to benchmark, resolved against a seeded user."""
+    name: str
+    url_name: str
+    method: str = 'get'
+    authenticated: bool = True
+    params: dict = field(default_factory=dict)
+    credentials: bool = False
+
+
+ENDPOINTS = [
+    Endpoint('recipes', 'recipe:recipe-list'),
+    Endpoint('tags', 'recipe:tag-list'),
+    Endpoint('ingredients', 'recipe:ingredient-list'),
+    Endpoint('user-token', 'user:token', method='post', authenticated=False, credentials=True),
+    Endpoint('user-me', 'user:me'),
+]
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries', 'peak_memory_kb')
+
+# Metrics where a larger value is an improvement.
+HIGHER_IS_BETTER = {'throughput_rps'}
+
+
+def percentile(samples, pct):
+    """Return the nearest-rank percentile of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class BenchmarkRunner:
+    """Time endpoints for one user with the Django test client."""
+
+    def __init__(self, user, password, iterations=50, warmup=5, cold=False):
+        self.user = user
+        self.password = password
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cold = cold
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = Client(SERVER_NAME='127.0.0.1')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+    def _request(self, endpoint):
+        if self.cold:
+            response_cache.invalidate_user(self.user.pk)
+        headers = self.auth if endpoint.authenticated else {}
+        data = dict(endpoint.params)
+        if endpoint.credentials:
+            data.update(email=self.user.email, password=self.password)
+        response = getattr(self.client, endpoint.method)(
+            reverse(endpoint.url_name), data, **headers,
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{endpoint.name} returned {response.status_code}: {response.content[:200]!r}'
+            )
+        return response
+
+    def measure(self, endpoint):
+        """Return the metrics of one endpoint."""
+        for _ in range(self.warmup):
+            self._request(endpoint)
+
+        samples = []
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            begin = time.perf_counter()
+            self._request(endpoint)
+            samples.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+
+        # Query capture and tracemalloc slow requests down, so they get
+        # their own untimed request.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connections['default']) as captured:
+                self._request(endpoint)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+            'throughput_rps': self.iterations / elapsed if elapsed else 0.0,
+            'queries': len(captured),
+            'peak_memory_kb': peak / 1024,
+        }
+
+    def run(self, endpoints=ENDPOINTS, label=''):
+        """Return metrics keyed by endpoint name and label."""
+        return {
+            f'{endpoint.name}@{label}' if label else endpoint.name: self.measure(endpoint)
+            for endpoint in endpoints
+        }
+
+
+def seed_user(size, password, stdout=None):
+    """Create a user owning size recipes with seed_data and return it."""
+    prefix = f'benchmark-{size}-'
+    call_command(
+        'seed_data', users=1, recipes_per_user=size, distribution='fixed',
+        email_prefix=prefix, password=password, stdout=stdout,
+    )
+    return get_user_model().objects.filter(email__startswith=prefix).latest('id')
+
+
+@dataclass
+class ServerEndpoint:
+    """An endpoint served by both the DRF views and the async views."""
+    name: str
+    url_name: str
+    async_url_name: str
+
+
+SERVER_ENDPOINTS = [
+    ServerEndpoint('recipes', 'recipe:recipe-list', 'recipe-async:recipe-list'),
+    ServerEndpoint('tags', 'recipe:tag-list', 'recipe-async:tag-list'),
+    ServerEndpoint('ingredients', 'recipe:ingredient-list', 'recipe-async:ingredient-list'),
+]
+
+# wsgi and asgi serve the DRF views, asgi-native serves the async views.
+SERVER_MODES = ('wsgi', 'asgi', 'asgi-native')
+
+SERVER_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+
+
+class ConcurrencyRunner:
+    """
+    Load endpoints with concurrent clients through the WSGI or ASGI handler.
+
+    The WSGI handler is driven by one thread per client, like a threaded
+    WSGI server. The ASGI handler is driven by one task per client on a
+    single event loop, like an ASGI server. The async views have no
+    response cache, so with cold set the DRF views miss it on every request.
+    """
+
+    def __init__(self, user, requests=200, concurrency=10, cold=True):
+        self.user = user
+        self.requests = requests
+        self.concurrency = concurrency
+        self.cold = cold
+        token, _ = Token.objects.get_or_create(user=user)
+        self.authorization = f'Token {token.key}'
+
+    def _before_request(self):
+        if self.cold:
+            response_cache.invalidate_user(self.user.pk)
+
+    def _check(self, status, path):
+        if status >= 400:
+            raise RuntimeError(f'{path} returned {status}')
+
+    def _run_wsgi(self, path):
+        handler = WSGIHandler()
+        factory = RequestFactory(SERVER_NAME='127.0.0.1')
+        counter = itertools.count()
+        samples, errors = [], []
+
+        def client():
+            try:
+                while next(counter) < self.requests:
+                    self._before_request()
+                    environ = factory.get(path, HTTP_AUTHORIZATION=self.authorization).environ
+                    begin = time.perf_counter()
+                    response = handler(environ, lambda status, headers: None)
+                    for _ in response:
+                        pass
+                    response.close()
+                    samples.append(time.perf_counter() - begin)
+                    self._check(response.status_code, path)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=client) for _ in range(self.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return samples, time.perf_counter() - started
+
+    async def _asgi_request(self, handler, path):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'127.0.0.1'),
+                (b'authorization', self.authorization.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('127.0.0.1', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await handler(scope, receive, send)
+        return messages[0]['status']
+
+    async def _run_asgi(self, path):
+        handler = ASGIHandler()
+        counter = itertools.count()
+        samples = []
+
+        async def client():
+            while next(counter) < self.requests:
+                await sync_to_async(self._before_request)()
+                begin = time.perf_counter()
+                status = await self._asgi_request(handler, path)
+                samples.append(time.perf_counter() - begin)
+                self._check(status, path)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(client() for _ in range(self.concurrency)))
+        finally:
+            # _before_request() runs in asgiref's shared sync thread, whose
+            # connection would otherwise stay checked out of the pool.
+            await sync_to_async(connections.close_all)()
+        return samples, time.perf_counter() - started
+
+    def measure(self, endpoint, mode):
+        """Return the latency and throughput of one endpoint in one mode."""
+        url_name = endpoint.async_url_name if mode == 'asgi-native' else endpoint.url_name
+        path = reverse(url_name)
+        if mode == 'wsgi':
+            samples, elapsed = self._run_wsgi(path)
+        else:
+            samples, elapsed = asyncio.run(self._run_asgi(path))
+        return {
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+            'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        }
+
+    def run(self, endpoints=SERVER_ENDPOINTS, modes=SERVER_MODES):
+        """Return metrics keyed by endpoint, mode and concurrency."""
+        return {
+            f'{endpoint.name}@{mode}-c{self.concurrency}': self.measure(endpoint, mode)
+            for endpoint in endpoints
+            for mode in modes
+        }
+
+
+def compare(results, baseline, threshold=0.2):
+    """Return a description of every metric that regressed past threshold."""
+    regressions = []
+    for key, metrics in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in METRICS:
+            old, new = previous.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                regressed = new < old * (1 - threshold)
+            elif metric == 'queries':
+                regressed = new > old
+            else:
+                regressed = new > old * (1 + threshold)
+            if regressed:
+                regressions.append(f'{key} {metric}: {old:.2f} -> {new:.2f}')
+    return regressions
+
+
+def load_baseline(path):
+    """Read a baseline saved by save_baseline."""
+    with open(path) as baseline:
+        return json.load(baseline)['results']
+
+
+def save_baseline(path, results):
+    """Write results as a JSON baseline."""
+    with open(path, 'w') as baseline:
+        json.dump({'results': results}, baseline, indent=2, sort_keys=True)
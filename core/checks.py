@@ -0,0 +1,118 @@
+"""
+System checks for the settings the core features depend on.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Backends whose entries are only visible to the process that wrote them.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias):
+    """Return whether every process sees the entries of the cache alias."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend is not None and backend not in PROCESS_LOCAL_CACHES
+
+
+def shared_cache_errors(setting, alias, reason, id):
+    """Return an error if the cache alias named by setting is not shared between processes."""
+    if is_shared_cache(alias):
+        return []
+    return [Error(
+        f"{setting} is '{alias}', which is not a cache shared between processes.",
+        hint=f'{reason} Point it at a Redis, Memcached, database or file based cache.',
+        id=id,
+    )]
+
+
+@register(Tags.caches)
+def check_slow_query_cache(app_configs, **kwargs):
+    """Require a shared cache for the slow query log."""
+    options = settings.SLOW_QUERIES
+    if not options['ENABLED']:
+        return []
+    return shared_cache_errors(
+        "SLOW_QUERIES['CACHE_ALIAS']",
+        options['CACHE_ALIAS'],
+        'Every worker writes to the slow query log, and the admin page and '
+        'manage.py slow_queries read it from other processes.',
+        'core.E001',
+    )
+
+
+@register(Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """Require a shared cache for read-your-writes pins when replicas are configured."""
+    options = settings.READ_REPLICAS
+    if not options['ALIASES']:
+        return []
+    return shared_cache_errors(
+        "READ_REPLICAS['CACHE_ALIAS']",
+        options['CACHE_ALIAS'],
+        'A client that wrote is pinned to the primary, and its next request '
+        'may be served by another worker.',
+        'core.E002',
+    )
+
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """Require a shared cache for the recipe API response cache."""
+    options = settings.RESPONSE_CACHE
+    if not options['ENABLED']:
+        return []
+    return shared_cache_errors(
+        "RESPONSE_CACHE['ALIAS']",
+        options['ALIAS'],
+        'A write invalidates the cached lists of its user in every worker.',
+        'core.E004',
+    )
+
+
+@register(Tags.caches)
+def check_token_auth_cache(app_configs, **kwargs):
+    """Require a shared cache for the generations of cached tokens."""
+    options = settings.TOKEN_AUTH_CACHE
+    if not options['ENABLED']:
+        return []
+    return shared_cache_errors(
+        "TOKEN_AUTH_CACHE['CACHE_ALIAS']",
+        options['CACHE_ALIAS'],
+        'A revoked token or deactivated user must stop authenticating in every worker.',
+        'core.E005',
+    )
+
+
+@register()
+def check_replica_sticky_seconds(app_configs, **kwargs):
+    """Require pins to outlast the lag a healthy replica may have."""
+    options = settings.READ_REPLICAS
+    if not options['ALIASES']:
+        return []
+    lag = options['MAX_LAG_SECONDS'] + options['CHECK_INTERVAL']
+    if options['STICKY_SECONDS'] >= lag:
+        return []
+    return [Error(
+        f"READ_REPLICAS['STICKY_SECONDS'] is {options['STICKY_SECONDS']}, less than "
+        f"MAX_LAG_SECONDS + CHECK_INTERVAL ({lag}).",
+        hint='A client that wrote could read a replica that does not have its write yet.',
+        id='core.E003',
+    )]
+
+
+@register()
+def check_metrics_dir(app_configs, **kwargs):
+    """Require a shared metrics directory when several processes serve requests."""
+    options = settings.METRICS
+    if options['WORKERS'] < 2 or options['DIR']:
+        return []
+    return [Error(
+        f"METRICS['WORKERS'] is {options['WORKERS']} but METRICS['DIR'] is not set.",
+        hint='/api/metrics/ would only report the requests of the worker answering it. '
+        'Set METRICS_DIR to a directory every worker can write to.',
+        id='core.E006',
+    )]
@@ -0,0 +1,13 @@
+"""
+MySQL backend with a connection pool.
+"""
+from django.db.backends.mysql import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL connections taken from and returned to a pool."""
+
+    def check_pooled_connection(self, connection):
+        connection.ping()
@@ -0,0 +1,15 @@
+"""
+SQLite backend with a connection pool, mainly to test pooling locally.
+"""
+from django.db.backends.sqlite3 import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite connections taken from and returned to a pool."""
+
+    def uses_pool(self):
+        # close() keeps in-memory connections open so the database survives,
+        # which would never hand them back to the pool.
+        return not self.is_in_memory_db()
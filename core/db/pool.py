@@ -0,0 +1,249 @@
+"""
+Connection pool shared by the pooled database backends.
+"""
+import threading
+import time
+from functools import partial
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of DB-API connections.
+
+    Connections are created by factory, checked with check before they are
+    handed out and replaced once they are older than max_lifetime seconds.
+    At most max_size connections exist at once; acquire() waits up to
+    timeout seconds for one to be released.
+    """
+
+    def __init__(self, factory, check=None, min_size=0, max_size=10,
+                 max_lifetime=1800, timeout=5):
+        self.factory = factory
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._idle = []
+        self._created_at = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self.counters = {
+            'created': 0, 'closed': 0, 'checkouts': 0,
+            'waits': 0, 'timeouts': 0, 'failed_checks': 0,
+        }
+
+    def _create(self):
+        """Create a connection for a slot already reserved in _size."""
+        try:
+            connection = self.factory()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+            self.counters['created'] += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created_at.pop(id(connection), None)
+            self._size -= 1
+            self.counters['closed'] += 1
+            self._condition.notify()
+
+    def _expired(self, connection):
+        created_at = self._created_at.get(id(connection), 0)
+        return time.monotonic() - created_at > self.max_lifetime
+
+    def _healthy(self, connection):
+        if self.check is None:
+            return True
+        try:
+            self.check(connection)
+        except Exception:
+            with self._condition:
+                self.counters['failed_checks'] += 1
+            return False
+        return True
+
+    def fill(self):
+        """Open connections until min_size exist."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._create()
+            with self._condition:
+                self._idle.append(connection)
+                self._condition.notify()
+
+    def acquire(self):
+        """Return a healthy connection, waiting up to timeout for one."""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No connection available after {self.timeout}s '
+                            f'({self.max_size} in use).'
+                        )
+                    if not waited:
+                        self.counters['waits'] += 1
+                        waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    # Most recently used first keeps the other connections
+                    # idle long enough to expire under low load.
+                    connection = self._idle.pop()
+                else:
+                    connection = None
+                    self._size += 1
+            if connection is None:
+                connection = self._create()
+            elif self._expired(connection) or not self._healthy(connection):
+                self._close(connection)
+                continue
+            with self._condition:
+                self.counters['checkouts'] += 1
+            return connection
+
+    def release(self, connection):
+        """Return a connection to the pool."""
+        if self._expired(connection):
+            self._close(connection)
+            return
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection that must not be reused."""
+        self._close(connection)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Return the pool size, connection states and counters."""
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                **self.counters,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory, check, options):
+    """Return the pool of alias, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                factory,
+                check=check,
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options.get('MAX_SIZE', 10),
+                max_lifetime=options.get('MAX_LIFETIME', 1800),
+                timeout=options.get('TIMEOUT', 5),
+            )
+    return pool
+
+
+def pool_stats():
+    """Return the stats of every pool by alias."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """Close the idle connections of every pool and forget the pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    DatabaseWrapper mixin taking connections from a ConnectionPool.
+
+    Pool options come from the POOL key of the database settings. Closing
+    the Django connection hands the DB-API connection back to the pool.
+    """
+
+    def check_pooled_connection(self, connection):
+        """Raise if a pooled connection is no longer usable."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    @property
+    def pool(self):
+        return _pools.get(self.alias)
+
+    def uses_pool(self):
+        """Return whether connections of this database are pooled."""
+        return True
+
+    def get_new_connection(self, conn_params):
+        if not self.uses_pool():
+            return super().get_new_connection(conn_params)
+        pool = get_pool(
+            self.alias,
+            partial(super().get_new_connection, conn_params),
+            self.check_pooled_connection,
+            self.settings_dict.get('POOL', {}),
+        )
+        pool.fill()
+        try:
+            return pool.acquire()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self.pool
+        if pool is None or not self.uses_pool():
+            return super()._close()
+        # A connection closed inside an atomic block stays attached to this
+        # wrapper until the block exits, so it must not be handed out again.
+        if self.in_atomic_block:
+            pool.discard(self.connection)
+            return
+        try:
+            self.connection.rollback()
+        except self.Database.Error:
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
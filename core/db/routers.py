@@ -0,0 +1,183 @@
+"""
+Database routers for shards and read replicas.
+"""
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core import sharding
+
+
+_route = contextvars.ContextVar('replica_route', default=None)
+
+
+class RouteState:
+    """Routing decisions of one request."""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+        self.replica = None
+
+
+def start_request(use_replica):
+    """Start routing the current context and return its state."""
+    state = RouteState(use_replica)
+    return state, _route.set(state)
+
+
+def end_request(token):
+    """Stop routing the current context."""
+    _route.reset(token)
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replication_lag(connection):
+    """Return how many seconds a replica is behind, or None if unknown."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+            except DatabaseError:
+                cursor.execute('SHOW SLAVE STATUS')
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            status = dict(zip([column[0] for column in cursor.description], row))
+            return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())'
+            )
+            return cursor.fetchone()[0]
+        cursor.execute('SELECT 1')
+        return 0
+
+
+def check_replica(alias):
+    """Return True when a replica answers and is within the allowed lag.
+
+    An unknown lag is unhealthy: MySQL reports NULL while replication is
+    stopped or broken, and no status at all for a server that is not a replica.
+    """
+    options = settings.READ_REPLICAS
+    try:
+        lag = replication_lag(connections[alias])
+    except DatabaseError:
+        return False
+    return lag is not None and lag <= options['MAX_LAG_SECONDS']
+
+
+def replica_is_healthy(alias):
+    """Return the cached result of check_replica, refreshing it when stale."""
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (None, 0))
+    if healthy is None or now - checked_at >= settings.READ_REPLICAS['CHECK_INTERVAL']:
+        healthy = check_replica(alias)
+        with _health_lock:
+            _health[alias] = (healthy, now)
+    return healthy
+
+
+def mark_unhealthy(alias):
+    """Take a replica out of rotation until its next check."""
+    with _health_lock:
+        _health[alias] = (False, time.monotonic())
+
+
+def primary_models():
+    """Return the labels of the models whose reads never go to a replica."""
+    return {settings.AUTH_USER_MODEL.lower(), 'authtoken.token', 'authtoken.tokenproxy', 'sessions.session'}
+
+
+def served_by_replica():
+    """Return True when the current request has read from a replica."""
+    state = _route.get()
+    return state is not None and state.replica not in (None, DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    """
+    Route reads of safe requests to a healthy replica, everything else to
+    the primary.
+
+    A request sticks to one replica. Once it writes, or while the primary
+    is in a transaction, its reads go to the primary as well. Users, tokens
+    and sessions are always read from the primary, so credentials work
+    before the replicas have them.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _route.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in primary_models():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            healthy = [
+                alias for alias in settings.READ_REPLICAS['ALIASES']
+                if replica_is_healthy(alias)
+            ]
+            state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _route.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ShardRouter:
+    """
+    Route sharded models to their user's shard.
+
+    The shard comes from the instance's database, then the shard activated
+    for the current context, then the instance's user. Models on the
+    default database are left to the routers after this one.
+    """
+
+    def _db(self, model, hints):
+        if not sharding.is_sharded(model) or len(sharding.shard_aliases()) == 1:
+            return None
+        instance = hints.get('instance')
+        alias = None
+        if instance is not None and instance._state.db:
+            alias = instance._state.db
+        if alias is None:
+            alias = sharding.current_shard()
+        if alias is None and getattr(instance, 'user_id', None) is not None:
+            alias = sharding.db_for_user_id(instance.user_id)
+        return None if alias in (None, DEFAULT_DB_ALIAS) else alias
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding.is_sharded(type(obj1)) or sharding.is_sharded(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db in sharding.shard_aliases():
+            return True
+        return None
@@ -0,0 +1,88 @@
+"""
+Django command to benchmark the API endpoints against seeded data.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to measure endpoint latency and compare baselines."""
+    help = 'Benchmark the API endpoints for one or more dataset sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,100,1000',
+            help='Comma separated recipe counts to seed a benchmark user with.',
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--endpoints', default='',
+            help='Comma separated endpoint names; all endpoints by default.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Invalidate the response cache before every request.',
+        )
+        parser.add_argument('--save', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare against this JSON file.')
+        parser.add_argument('--threshold', type=float, default=0.2)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the seeded benchmark users afterwards.',
+        )
+
+    def _endpoints(self, names):
+        if not names:
+            return benchmark.ENDPOINTS
+        wanted = set(names.split(','))
+        unknown = wanted - {endpoint.name for endpoint in benchmark.ENDPOINTS}
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        return [endpoint for endpoint in benchmark.ENDPOINTS if endpoint.name in wanted]
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers.')
+        endpoints = self._endpoints(options['endpoints'])
+        self.password = 'benchmark-pass'
+
+        results = {}
+        users = []
+        try:
+            for size in sizes:
+                user = benchmark.seed_user(size, self.password, self.stdout)
+                users.append(user)
+                runner = benchmark.BenchmarkRunner(
+                    user, self.password, iterations=options['iterations'],
+                    warmup=options['warmup'], cold=options['cold'],
+                )
+                results.update(runner.run(endpoints, label=str(size)))
+        finally:
+            if not options['keep']:
+                get_user_model().objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write(f"{'endpoint':<24}" + ''.join(f'{m:>16}' for m in benchmark.METRICS))
+        for key, metrics in results.items():
+            self.stdout.write(
+                f'{key:<24}' + ''.join(f'{metrics[m]:>16.2f}' for m in benchmark.METRICS)
+            )
+
+        if options['save']:
+            benchmark.save_baseline(options['save'], results)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+
+        if options['baseline']:
+            try:
+                baseline = benchmark.load_baseline(options['baseline'])
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'Could not read baseline: {exc}')
+            regressions = benchmark.compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Regressions found:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,82 @@
+"""
+Django command to compare the WSGI and ASGI paths under concurrent load.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to measure tail latency and throughput per server mode."""
+    help = (
+        'Load the recipe, tag and ingredient lists with concurrent clients '
+        'through WSGI, through ASGI, and through the native async views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Recipes of the benchmark user.')
+        parser.add_argument(
+            '--concurrency', default='1,10,50',
+            help='Comma separated numbers of concurrent clients.',
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run.')
+        parser.add_argument(
+            '--endpoints', default='',
+            help='Comma separated endpoint names; all endpoints by default.',
+        )
+        parser.add_argument(
+            '--modes', default=','.join(benchmark.SERVER_MODES),
+            help='Comma separated server modes.',
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Let the DRF views answer from the response cache.',
+        )
+        parser.add_argument('--save', help='Write the results to this JSON file.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the seeded benchmark user afterwards.',
+        )
+
+    def _select(self, value, choices, label):
+        wanted = value.split(',') if value else list(choices)
+        unknown = set(wanted) - set(choices)
+        if unknown:
+            raise CommandError(f"Unknown {label}: {', '.join(sorted(unknown))}")
+        return wanted
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma separated list of integers.')
+        names = self._select(
+            options['endpoints'], [endpoint.name for endpoint in benchmark.SERVER_ENDPOINTS], 'endpoints',
+        )
+        endpoints = [endpoint for endpoint in benchmark.SERVER_ENDPOINTS if endpoint.name in names]
+        modes = self._select(options['modes'], benchmark.SERVER_MODES, 'modes')
+
+        user = benchmark.seed_user(options['size'], 'benchmark-pass', self.stdout)
+        results = {}
+        try:
+            for concurrency in levels:
+                runner = benchmark.ConcurrencyRunner(
+                    user, requests=options['requests'], concurrency=concurrency,
+                    cold=not options['warm'],
+                )
+                results.update(runner.run(endpoints, modes))
+        finally:
+            if not options['keep']:
+                get_user_model().objects.filter(pk=user.pk).delete()
+
+        self.stdout.write(f"{'endpoint':<32}" + ''.join(f'{m:>16}' for m in benchmark.SERVER_METRICS))
+        for key, metrics in results.items():
+            self.stdout.write(
+                f'{key:<32}' + ''.join(f'{metrics[m]:>16.2f}' for m in benchmark.SERVER_METRICS)
+            )
+
+        if options['save']:
+            benchmark.save_baseline(options['save'], results)
+            self.stdout.write(f"Saved results to {options['save']}")
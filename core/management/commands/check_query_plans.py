@@ -0,0 +1,102 @@
+"""
+Django command to check the query plans of the API viewsets.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipe import views
+
+
+QUERY_SHAPES = [
+    (views.RecipeViewSet, 'list', {}),
+    (views.RecipeViewSet, 'list', {'tags': '1,2'}),
+    (views.RecipeViewSet, 'list', {'ingredients': '1,2'}),
+    (views.RecipeViewSet, 'list', {'tags': '1,2', 'match': 'all'}),
+    (views.RecipeViewSet, 'retrieve', {}),
+    (views.TagViewSet, 'list', {}),
+    (views.TagViewSet, 'list', {'assigned_only': '1'}),
+    (views.TagViewSet, 'list', {'ordering': '-recipe_count'}),
+    (views.IngredientViewSet, 'list', {}),
+    (views.IngredientViewSet, 'list', {'assigned_only': '1'}),
+    (views.IngredientViewSet, 'list', {'ordering': '-recipe_count'}),
+]
+
+PLAN_PROBLEMS = {
+    'mysql': [
+        (re.compile(r'\bALL\b'), 'full table scan'),
+        (re.compile(r'Using filesort'), 'filesort'),
+    ],
+    'sqlite': [
+        (re.compile(r'\bSCAN \w+$', re.MULTILINE), 'full table scan'),
+        (re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'), 'filesort'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan'), 'full table scan'),
+        (re.compile(r'\bSort\b'), 'filesort'),
+    ],
+}
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN the SQL generated by the viewsets."""
+    help = 'Run EXPLAIN on each viewset query and fail on full scans or filesorts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email of the user to build queries for (default: first user).',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print every plan, not only the failing ones.',
+        )
+
+    def _get_user(self, email):
+        User = get_user_model()
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f'User {email} does not exist.')
+        return User.objects.order_by('id').first() or User(pk=0)
+
+    def _get_queryset(self, viewset, action, params, user):
+        view = viewset(action=action, format_kwarg=None, kwargs={})
+        view.request = Request(APIRequestFactory().get('/', params))
+        view.request.user = user
+        queryset = view.get_queryset()
+        if action == 'retrieve':
+            return queryset.filter(pk=0)
+        return queryset[:view.paginator.max_page_size + 1]
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = self._get_user(options['user'])
+        failures = 0
+        for viewset, action, params in QUERY_SHAPES:
+            queryset = self._get_queryset(viewset, action, params, user)
+            vendor = connections[router.db_for_read(queryset.model)].vendor
+            plan = queryset.explain()
+            problems = [
+                message for pattern, message in PLAN_PROBLEMS.get(vendor, [])
+                if pattern.search(plan)
+            ]
+            label = f'{viewset.__name__}.{action} {params or ""}'.strip()
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'{label}: {", ".join(problems)}'))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{label}: ok'))
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{failures} query plan(s) use a full scan or filesort.')
@@ -0,0 +1,139 @@
+"""
+Django command to bulk load recipes from NDJSON.
+"""
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.sharding import UserMoving, writing
+from recipe.bulk import create_recipes
+from recipe.serializers import RecipeDetailSerializer
+
+
+def validate_lines(lines):
+    """Parse and validate (line number, text) pairs as recipe records."""
+    results = []
+    for lineno, line in lines:
+        try:
+            serializer = RecipeDetailSerializer(data=json.loads(line))
+        except ValueError as exc:
+            results.append((lineno, None, str(exc)))
+            continue
+        if serializer.is_valid():
+            results.append((lineno, dict(serializer.validated_data), None))
+        else:
+            results.append((lineno, None, json.loads(json.dumps(serializer.errors))))
+    return results
+
+
+class Command(BaseCommand):
+    """Django command to import recipes in batches."""
+    help = 'Import recipes for a user from an NDJSON file, one recipe per line.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file to read, or - for stdin.')
+        parser.add_argument('--user', required=True, help='Email of the owning user.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of recipes written per transaction.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the last imported line, used to resume.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Validate batches in this many worker processes.',
+        )
+
+    def _read_checkpoint(self, path):
+        if path and os.path.exists(path):
+            with open(path) as checkpoint:
+                return json.load(checkpoint)['line']
+        return 0
+
+    def _write_checkpoint(self, path, line):
+        if path:
+            with open(f'{path}.tmp', 'w') as checkpoint:
+                json.dump({'line': line}, checkpoint)
+            os.replace(f'{path}.tmp', path)
+
+    def _batches(self, stream, batch_size, start_line):
+        """Yield lists of (line number, text) pairs past the checkpoint."""
+        batch = []
+        for lineno, line in enumerate(stream, 1):
+            if lineno <= start_line or not line.strip():
+                continue
+            batch.append((lineno, line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _validated(self, batches, workers):
+        """Yield validated batches in order, fanning out to a process pool."""
+        if workers < 2:
+            yield from map(validate_lines, batches)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.submit(validate_lines, batch))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        start_line = self._read_checkpoint(options['checkpoint'])
+        if start_line:
+            self.stdout.write(f'Resuming after line {start_line}.')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'])
+        imported = invalid = 0
+        started = time.monotonic()
+        try:
+            batches = self._batches(stream, options['batch_size'], start_line)
+            for results in self._validated(batches, options['workers']):
+                records = [data for _, data, errors in results if errors is None]
+                for lineno, _, errors in results:
+                    if errors is not None:
+                        self.stderr.write(f'Line {lineno}: {errors}')
+                try:
+                    with writing(user.pk) as alias, transaction.atomic(using=alias):
+                        create_recipes(user, records)
+                except UserMoving:
+                    raise CommandError(
+                        f'{user.email} is being moved to another shard, stopped '
+                        f'after importing {imported} recipe(s).'
+                    )
+                self._write_checkpoint(options['checkpoint'], results[-1][0])
+                imported += len(records)
+                invalid += len(results) - len(records)
+                rate = imported / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(f'{imported} imported, {invalid} invalid, {rate:.0f} rows/s')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipe(s), skipped {invalid} invalid line(s).'
+        ))
@@ -0,0 +1,25 @@
+"""
+Django command to issue a request profiling token.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    """Django command to sign a profiling token for a staff user."""
+    help = 'Print a token to send in the X-Profile header or _profile parameter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the staff user the token is issued to.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['email'], is_staff=True)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No staff user with email {options['email']}.")
+        self.stdout.write(make_token(user))
+        self.stderr.write(f"Valid for {settings.PROFILER['MAX_AGE']} seconds.")
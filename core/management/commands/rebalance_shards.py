@@ -0,0 +1,167 @@
+"""
+Django command to move users' recipe data between shards.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+
+from core import sharding
+from core.authentication import token_cache
+from core.checks import is_shared_cache
+from core.models import Recipe, Tag, Ingredient
+
+
+RELATIONS = (('tags', Tag), ('ingredients', Ingredient))
+
+
+def _insert(model, objs, using):
+    """Insert objs on the database using, keeping their primary keys."""
+    for obj in objs:
+        obj._state.adding = True
+    model.objects.using(using).bulk_create(objs, batch_size=1000)
+
+
+def _delete_data(user, using):
+    """Delete a user's recipes, tags and ingredients from one shard."""
+    Recipe.objects.using(using).filter(user=user).delete()
+    for _, model in RELATIONS:
+        model.objects.using(using).filter(user=user).delete()
+
+
+def move_user(user, index):
+    """
+    Move a user's recipe data to shard index and return the number of recipes moved.
+
+    Rows keep their ids, which are unique across shards. The user's writes
+    are refused while the move runs, and saving the user's new shard drops
+    its cached shard and tokens in every process.
+    """
+    source = sharding.db_for_user(user)
+    target = sharding.alias_for_shard(index)
+    if source == target:
+        return 0
+
+    with sharding.moving(user.pk):
+        if target != DEFAULT_DB_ALIAS:
+            copy.copy(user).save(using=target)
+        with transaction.atomic(using=target):
+            # Left over by an earlier move that stopped before switching shards.
+            _delete_data(user, target)
+            for _, model in RELATIONS:
+                _insert(model, list(model.objects.using(source).filter(user=user)), target)
+            recipes = list(Recipe.objects.using(source).filter(user=user))
+            _insert(Recipe, recipes, target)
+            for name, model in RELATIONS:
+                through = Recipe._meta.get_field(name).remote_field.through
+                column = f'{model._meta.model_name}_id'
+                links = through.objects.using(source).filter(recipe__user=user) \
+                    .values_list('recipe_id', column)
+                through.objects.using(target).bulk_create([
+                    through(recipe_id=recipe_id, **{column: attr_id})
+                    for recipe_id, attr_id in links
+                ], batch_size=1000)
+
+        user.shard = index
+        user.save(update_fields=['shard'])
+
+        if source == DEFAULT_DB_ALIAS:
+            _delete_data(user, source)
+        else:
+            get_user_model()._base_manager.using(source).filter(pk=user.pk).delete()
+    return len(recipes)
+
+
+def plan_moves(max_moves):
+    """Return (user_id, from_index, to_index) moves evening out the recipes per shard."""
+    users = {
+        index: dict(
+            Recipe.objects.using(alias).values_list('user_id')
+            .annotate(total=Count('pk')).order_by()
+        )
+        for index, alias in enumerate(sharding.shard_aliases())
+    }
+    loads = {index: sum(counts.values()) for index, counts in users.items()}
+    moves = []
+    while len(moves) < max_moves:
+        heaviest = max(loads, key=loads.get)
+        lightest = min(settings.SHARDING['OPEN'], key=loads.get)
+        gap = loads[heaviest] - loads[lightest]
+        candidates = [
+            (total, user_id) for user_id, total in users[heaviest].items()
+            if 0 < total <= gap // 2
+        ]
+        if not candidates:
+            break
+        total, user_id = max(candidates)
+        del users[heaviest][user_id]
+        users[lightest][user_id] = total
+        loads[heaviest] -= total
+        loads[lightest] += total
+        moves.append((user_id, heaviest, lightest))
+    return moves
+
+
+class Command(BaseCommand):
+    """Django command to move users between shards."""
+    help = (
+        'Move one user to another shard, or even out recipes across shards. '
+        'Moved rows keep their ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the user to move.')
+        parser.add_argument('--to', type=int, help='Shard index to move the user to.')
+        parser.add_argument(
+            '--auto',
+            action='store_true',
+            help='Move the users needed to even out recipes across the open shards.',
+        )
+        parser.add_argument('--max-moves', type=int, default=10)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def _check_caches(self):
+        """Refuse to move users unless the app servers see the moves."""
+        aliases = {"SHARDING['CACHE_ALIAS']": settings.SHARDING['CACHE_ALIAS']}
+        if settings.TOKEN_AUTH_CACHE['ENABLED']:
+            aliases["TOKEN_AUTH_CACHE['CACHE_ALIAS']"] = token_cache.alias
+        for setting, alias in aliases.items():
+            if not is_shared_cache(alias):
+                raise CommandError(
+                    f"{setting} is '{alias}', whose entries are local to each process, "
+                    'so the app servers would keep routing moved users to their old shard.'
+                )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        User = get_user_model()
+        if options['auto']:
+            moves = plan_moves(options['max_moves'])
+        elif options['user'] and options['to'] is not None:
+            if not 0 <= options['to'] < len(sharding.shard_aliases()):
+                raise CommandError(f"Shard {options['to']} does not exist.")
+            try:
+                user = User.objects.get(email=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+            moves = [(user.pk, user.shard, options['to'])]
+        else:
+            raise CommandError('Pass --user and --to, or --auto.')
+
+        if not options['dry_run']:
+            self._check_caches()
+        for user_id, source, target in moves:
+            user = User.objects.get(pk=user_id)
+            if options['dry_run']:
+                self.stdout.write(f'Would move {user.email} from shard {source} to {target}.')
+                continue
+            try:
+                moved = move_user(user, target)
+            except TimeoutError as exc:
+                raise CommandError(f'Could not move {user.email}: {exc}')
+            self.stdout.write(f'Moved {user.email} from shard {source} to {target}, {moved} recipe(s).')
+        verb = 'planned' if options['dry_run'] else 'done'
+        self.stdout.write(self.style.SUCCESS(f'{len(moves)} move(s) {verb}.'))
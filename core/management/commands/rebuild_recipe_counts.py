@@ -0,0 +1,59 @@
+"""
+Django command to rebuild the tag and ingredient recipe counts.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from core.models import Recipe
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to recount recipe links in batches."""
+    help = 'Recompute recipe_count for tags and ingredients in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows recounted per transaction.',
+        )
+
+    def _rebuild(self, using, field_name, batch_size):
+        """Recount one relation on one shard, returning the number of corrected rows."""
+        field = Recipe._meta.get_field(field_name)
+        model = field.related_model
+        through = field.remote_field.through
+        column = f'{model._meta.model_name}_id'
+        corrected = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=using):
+                rows = list(
+                    model.objects.using(using).filter(pk__gt=last_pk).order_by('pk')
+                    .select_for_update().only('pk', 'recipe_count')[:batch_size]
+                )
+                if not rows:
+                    return corrected
+                counts = dict(
+                    through.objects.using(using).filter(**{f'{column}__in': [row.pk for row in rows]})
+                    .values_list(column).annotate(total=Count('pk'))
+                )
+                stale = []
+                for row in rows:
+                    if row.recipe_count != counts.get(row.pk, 0):
+                        row.recipe_count = counts.get(row.pk, 0)
+                        stale.append(row)
+                model.objects.using(using).bulk_update(stale, ['recipe_count'])
+            corrected += len(stale)
+            last_pk = rows[-1].pk
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for alias in shard_aliases():
+            for field_name in ('tags', 'ingredients'):
+                corrected = self._rebuild(alias, field_name, options['batch_size'])
+                self.stdout.write(f'{alias} {field_name}: corrected {corrected} row(s).')
+        self.stdout.write(self.style.SUCCESS('Recipe counts rebuilt.'))
@@ -0,0 +1,190 @@
+"""
+Django command to generate synthetic users and recipes for load testing.
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core import sharding
+from core.models import Recipe, Tag, Ingredient
+
+
+WORDS = [
+    'spicy', 'smoked', 'roasted', 'crispy', 'creamy', 'garlic', 'lemon',
+    'chicken', 'tofu', 'salmon', 'lentil', 'noodle', 'curry', 'salad',
+    'soup', 'stew', 'pie', 'tacos', 'risotto', 'pancakes', 'herb', 'chili',
+]
+
+
+class Command(BaseCommand):
+    """Django command to seed a production sized dataset."""
+    help = 'Generate users, recipes, tags, ingredients and links with bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes-per-user', type=int, default=100)
+        parser.add_argument('--tags-per-user', type=int, default=20)
+        parser.add_argument('--ingredients-per-user', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--distribution',
+            choices=['fixed', 'uniform', 'exponential'],
+            default='uniform',
+            help='How per-user and per-recipe counts vary around their means.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50000,
+            help='Approximate number of recipes written per transaction.',
+        )
+        parser.add_argument('--email-prefix', default='seed')
+        parser.add_argument('--password', default='seedpass123')
+
+    def _draw(self, mean):
+        """Draw a non-negative count around mean."""
+        if self.distribution == 'fixed' or mean == 0:
+            return mean
+        if self.distribution == 'uniform':
+            return self.rng.randint(0, 2 * mean)
+        return min(int(self.rng.expovariate(1 / mean)), 20 * mean)
+
+    def _next_ids(self):
+        """Return the first free primary key of each seeded model."""
+        ids = {
+            model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+            for model in (get_user_model(), Tag, Ingredient, Recipe)
+        }
+        if sharding.allocates_ids():
+            # Ids may have been handed out past the default database's
+            # highest, and reservations start past the seeded rows once
+            # they are inserted.
+            ids.update((model, sharding.reserve_ids(model, 0)) for model in (Tag, Ingredient, Recipe))
+        return ids
+
+    def _columns(self):
+        """Return the columns written for each seeded table, in row order."""
+        return {
+            get_user_model(): [
+                'id', 'password', 'last_login', 'is_superuser', 'email', 'name',
+                'is_active', 'is_staff', 'shard',
+            ],
+            Tag: ['id', 'name', 'user_id', 'recipe_count'],
+            Ingredient: ['id', 'name', 'user_id', 'recipe_count'],
+            Recipe: ['id', 'user_id', 'title', 'description', 'time_minutes', 'price', 'link', 'image'],
+            Recipe.tags.through: ['recipe_id', 'tag_id'],
+            Recipe.ingredients.through: ['recipe_id', 'ingredient_id'],
+        }
+
+    def _insert_sql(self, model, columns):
+        """Return a parametrized INSERT statement for model's table."""
+        quote = connection.ops.quote_name
+        return 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+    def _generate_user(self, options, batch):
+        """Append the rows of one user with their attributes, recipes and links to batch."""
+        User = get_user_model()
+        user_id = self.ids[User]
+        self.ids[User] += 1
+        # Seeded data goes to the default database; rebalance_shards
+        # spreads it over the other shards.
+        batch[User].append((
+            user_id, self.password, None, False,
+            f"{options['email_prefix']}{user_id}@example.com", f'Seed User {user_id}',
+            True, False, 0,
+        ))
+
+        attrs = {}
+        for model, option in ((Tag, 'tags_per_user'), (Ingredient, 'ingredients_per_user')):
+            count = max(self._draw(options[option]), 1)
+            names = [
+                f'{self.rng.choice(WORDS)} {model.__name__.lower()} {index}'
+                for index in range(count)
+            ]
+            attrs[model] = (self.ids[model], names, [0] * count)
+            self.ids[model] += count
+
+        for _ in range(self._draw(options['recipes_per_user'])):
+            recipe_id = self.ids[Recipe]
+            self.ids[Recipe] += 1
+            batch[Recipe].append((
+                recipe_id,
+                user_id,
+                ' '.join(self.rng.choices(WORDS, k=3)).title(),
+                ' '.join(self.rng.choices(WORDS, k=12)),
+                self.rng.randint(5, 240),
+                Decimal(self.rng.randint(100, 9999)) / 100,
+                '',
+                '',
+            ))
+            for model, field in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+                first_id, names, counts = attrs[model]
+                through = Recipe._meta.get_field(field).remote_field.through
+                count = min(self._draw(options[f'{field}_per_recipe']), len(names))
+                for index in self.rng.sample(range(len(names)), count):
+                    counts[index] += 1
+                    batch[through].append((recipe_id, first_id + index))
+
+        for model, (first_id, names, counts) in attrs.items():
+            batch[model].extend(
+                (first_id + index, name, user_id, counts[index])
+                for index, name in enumerate(names)
+            )
+
+    def _flush(self, batch):
+        """Insert a batch, parents before children, in one transaction."""
+        rows = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, values in batch.items():
+                if values:
+                    cursor.executemany(self.statements[model], values)
+                rows += len(values)
+                values.clear()
+        return rows
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.rng = random.Random(options['seed'])
+        self.distribution = options['distribution']
+        self.password = make_password(options['password'])
+        self.ids = self._next_ids()
+        # Rows are plain tuples written with executemany(); building model
+        # instances for bulk_create() cost more than the inserts themselves.
+        columns = self._columns()
+        self.statements = {model: self._insert_sql(model, names) for model, names in columns.items()}
+        batch = {model: [] for model in columns}
+
+        rows = 0
+        started = time.monotonic()
+        for _ in range(options['users']):
+            self._generate_user(options, batch)
+            if len(batch[Recipe]) >= options['batch_size']:
+                rows += self._flush(batch)
+                rate = rows / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(f'{rows} rows, {rate:.0f} rows/s')
+        rows += self._flush(batch)
+
+        # Explicit ids leave PostgreSQL sequences behind; MySQL and SQLite
+        # advance their counters on their own.
+        statements = connection.ops.sequence_reset_sql(no_style(), list(batch))
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s).'
+        ))
@@ -0,0 +1,45 @@
+"""
+Django command to show the captured slow queries.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.checks import is_shared_cache
+from core.slow_queries import slow_query_log
+
+
+class Command(BaseCommand):
+    """Django command to print or clear the slow query buffer."""
+    help = 'Print the slowest recent queries captured by the slow query log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='Print one JSON object per line.')
+        parser.add_argument('--clear', action='store_true', help='Empty the buffer afterwards.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if not is_shared_cache(slow_query_log.alias):
+            raise CommandError(
+                f"Cache '{slow_query_log.alias}' is local to each process, so the slow "
+                "queries of the web workers cannot be read from here. Set "
+                "SLOW_QUERIES['CACHE_ALIAS'] to a shared cache."
+            )
+        entries = slow_query_log.entries()[:options['limit']]
+        for entry in entries:
+            if options['json']:
+                self.stdout.write(json.dumps(entry, sort_keys=True))
+                continue
+            self.stdout.write(
+                f"{entry['duration_ms']:.1f} ms  {entry['view'] or '-'}  {entry['call_site'] or '-'}"
+            )
+            self.stdout.write(f"  {entry['sql']}")
+            self.stdout.write(f"  params: {entry['params']}")
+            if entry['plan']:
+                self.stdout.write('  ' + entry['plan'].replace('\n', '\n  '))
+        if not entries:
+            self.stdout.write('No slow queries captured.')
+        if options['clear']:
+            slow_query_log.clear()
+            self.stdout.write(self.style.SUCCESS('Cleared the slow query log.'))
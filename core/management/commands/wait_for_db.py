@@ -1,27 +1,129 @@
 """
 Django command to wait for the database to be available.
 """
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from psycopg2 import OperationalError as Psycopg2OpError
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import InterfaceError, OperationalError
 
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+def database_errors(connection):
+    """Return the exceptions a database raises while it is starting up."""
+    return (
+        OperationalError,
+        InterfaceError,
+        connection.Database.OperationalError,
+        connection.Database.InterfaceError,
+    )
 
 
 class Command(BaseCommand):
-    """Django command to wait for database."""
+    """Django command to wait for the database and other backends."""
+    help = (
+        'Wait until every database, and optionally every cache and the '
+        'default storage, answers. Each is polled in its own thread with '
+        'capped exponential backoff and jitter.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--databases', default='',
+            help='Comma separated database aliases; all of DATABASES by default.',
+        )
+        parser.add_argument('--caches', action='store_true', help='Also wait for every cache.')
+        parser.add_argument('--storage', action='store_true', help='Also wait for the default storage.')
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait in total before failing; 0 waits forever.',
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+
+    def check_database(self, alias):
+        """Open a connection to alias and run a trivial query."""
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()
+
+    def check_cache(self, alias):
+        """Write and read back a key in a cache."""
+        cache = caches[alias]
+        cache.set('wait_for_db', alias, 10)
+        if cache.get('wait_for_db') != alias:
+            raise ConnectionError(f'cache {alias} did not return a written key')
+
+    def check_storage(self):
+        """Look up a file in the default storage."""
+        default_storage.exists('wait_for_db')
+
+    def _dependencies(self, options):
+        """Return (name, check, retried exceptions) for every dependency to wait for."""
+        aliases = options['databases'].split(',') if options['databases'] else list(settings.DATABASES)
+        unknown = set(aliases) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f"Unknown databases: {', '.join(sorted(unknown))}")
+        dependencies = [
+            (f'Database {alias}', lambda alias=alias: self.check_database(alias),
+             database_errors(connections[alias]))
+            for alias in aliases
+        ]
+        # Cache and storage backends raise their client library's errors.
+        if options['caches']:
+            dependencies += [
+                (f'Cache {alias}', lambda alias=alias: self.check_cache(alias), Exception)
+                for alias in settings.CACHES
+            ]
+        if options['storage']:
+            dependencies.append(('Storage', self.check_storage, Exception))
+        return dependencies
+
+    def _wait(self, name, check, errors, deadline, options):
+        """Retry check until it passes and return whether it did before deadline."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                check()
+            except errors as exc:
+                # Full jitter keeps several app instances from polling in lockstep.
+                backoff = options['initial_delay'] * 2 ** min(attempt, 32)
+                delay = random.uniform(0, min(options['max_delay'], backoff))
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stderr.write(f'{name} unavailable: {exc}')
+                        return False
+                    delay = min(delay, remaining)
+                self.stdout.write(f'{name} unavailable, waiting {delay:.2f} seconds...')
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.stdout.write(f'{name} available after {time.monotonic() - started:.2f} seconds.')
+                return True
 
     def handle(self, *args, **options):
         """Entrypoint for command."""
+        dependencies = self._dependencies(options)
+        deadline = time.monotonic() + options['timeout'] if options['timeout'] > 0 else None
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
+        with ThreadPoolExecutor(max_workers=len(dependencies)) as executor:
+            futures = {
+                name: executor.submit(self._wait, name, check, errors, deadline, options)
+                for name, check, errors in dependencies
+            }
+        unavailable = [name for name, future in futures.items() if not future.result()]
+        if unavailable:
+            raise CommandError(
+                f"Gave up after {options['timeout']:g} seconds waiting for {', '.join(unavailable)}."
+            )
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,57 @@
+"""
+Sampled per-request memory tracing with tracemalloc.
+"""
+import random
+import threading
+import tracemalloc
+
+from django.conf import settings
+
+from core.profiling import short_path
+
+
+# tracemalloc traces every thread, so only one request per process is
+# traced at a time to keep other requests out of its numbers.
+_lock = threading.Lock()
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemoryTrace:
+    """Peak memory and top allocation sites of one request."""
+
+    def __init__(self, frames=1, top_sites=10):
+        self.frames = frames
+        self.top_sites = top_sites
+        self.peak = 0
+        self.sites = []
+
+    def stop(self):
+        """Stop tracing and collect the peak and the largest allocation sites."""
+        try:
+            _, self.peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        finally:
+            tracemalloc.stop()
+            _lock.release()
+        self.sites = [
+            (f'{short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}', stat.size)
+            for stat in snapshot.statistics('lineno')[:self.top_sites]
+        ]
+        return self
+
+
+def start_trace():
+    """Start tracing a sampled request and return its trace, or None."""
+    options = settings.MEMORY_TRACING
+    if not options['SAMPLE_RATE'] or random.random() >= options['SAMPLE_RATE']:
+        return None
+    if tracemalloc.is_tracing() or not _lock.acquire(blocking=False):
+        return None
+    tracemalloc.start(options['FRAMES'])
+    return MemoryTrace(options['FRAMES'], options['TOP_SITES'])
@@ -0,0 +1,285 @@
+"""
+Process-level metrics exposed in the Prometheus text format.
+
+Each process aggregates its own counters and histograms in memory. When
+METRICS['DIR'] is set, every process also writes a snapshot of them to
+its own file in that directory, and the metrics view sums all snapshots
+so any worker can answer for the whole server. Snapshots of processes
+that have exited on this host are taken over by the collecting process:
+their counters and histograms live on in its snapshot, their gauges are
+dropped.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.db.pool import pool_stats
+
+
+COUNTERS = {
+    'http_requests_total': 'Requests handled, by view, method and status.',
+    'cache_requests_total': 'Cache lookups, by cache and result.',
+    'memory_traced_requests_total': 'Requests sampled for memory tracing, by view.',
+    'memory_allocated_bytes_total': (
+        'Bytes still allocated at the end of traced requests, by view and top allocation site.'
+    ),
+    'db_pool_events_total': 'Connection pool checkouts, waits, timeouts and churn, by alias and event.',
+}
+
+GAUGES = {
+    'db_pool_connections': 'Pooled database connections, by alias and state.',
+}
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Request latency by view.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'http_response_size_bytes': (
+        'Response body size by view.',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+    'db_queries_per_request': (
+        'Database queries per request by view.',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'http_request_peak_memory_bytes': (
+        'Peak traced memory of sampled requests by view.',
+        (65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456),
+    ),
+}
+
+# Caches exposing stats() with hits and misses, reported as cache_requests_total.
+CACHE_STATS = {
+    'token': 'core.authentication.token_cache',
+    'response': 'recipe.cache.response_cache',
+}
+
+POOL_EVENTS = ('created', 'closed', 'checkouts', 'waits', 'timeouts', 'failed_checks')
+
+
+class MetricsRegistry:
+    """Thread safe counters and histograms of one process."""
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def inc(self, name, labels, value=1):
+        """Add value to a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """Record value in a histogram."""
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts, total, count = self.histograms.get(key) or ([0] * len(buckets), 0, 0)
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                counts[index] += 1
+            self.histograms[key] = (counts, total + value, count + 1)
+
+    def observe_request(self, view, method, status, duration, size, db_queries):
+        """Record one handled request."""
+        self.inc('http_requests_total', {'view': view, 'method': method, 'status': str(status)})
+        self.observe('http_request_duration_seconds', {'view': view}, duration)
+        if size is not None:
+            self.observe('http_response_size_bytes', {'view': view}, size)
+        self.observe('db_queries_per_request', {'view': view}, db_queries)
+        self.maybe_flush()
+
+    def observe_memory(self, view, peak, sites):
+        """Record the peak memory and top allocation sites of a traced request."""
+        self.inc('memory_traced_requests_total', {'view': view})
+        self.observe('http_request_peak_memory_bytes', {'view': view}, peak)
+        for site, size in sites:
+            self.inc('memory_allocated_bytes_total', {'view': view, 'site': site}, size)
+
+    def snapshot(self):
+        """Return the metrics of this process as JSON serializable data."""
+        with self._lock:
+            counters = [[name, labels, value] for (name, labels), value in self.counters.items()]
+            histograms = [
+                [name, labels, list(counts), total, count]
+                for (name, labels), (counts, total, count) in self.histograms.items()
+            ]
+        for cache_name, path in CACHE_STATS.items():
+            stats = import_string(path).stats()
+            for result, field in (('hit', 'hits'), ('miss', 'misses')):
+                labels = [['cache', cache_name], ['result', result]]
+                counters.append(['cache_requests_total', labels, stats[field]])
+        gauges = []
+        for alias, stats in pool_stats().items():
+            for state in ('idle', 'in_use'):
+                gauges.append(['db_pool_connections', [['alias', alias], ['state', state]], stats[state]])
+            for event in POOL_EVENTS:
+                counters.append(['db_pool_events_total', [['alias', alias], ['event', event]], stats[event]])
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def _path(self):
+        return os.path.join(self.directory, f'{socket.gethostname()}-{os.getpid()}.json')
+
+    def flush(self):
+        """Write this process' snapshot to the metrics directory."""
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        path = self._path()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as snapshot:
+            json.dump(self.snapshot(), snapshot)
+        os.replace(tmp_path, path)
+
+    def maybe_flush(self):
+        """Flush when the last flush is older than the flush interval."""
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _exited(self, filename):
+        """Return whether a snapshot belongs to a process of this host that has exited."""
+        hostname, _, pid = filename[:-len('.json')].rpartition('-')
+        # os.kill() terminates the process on Windows, whatever the signal.
+        if os.name != 'posix' or hostname != socket.gethostname() or not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def _inherit(self, filename):
+        """Add an exited process' counters and histograms to this one's and return the claimed file."""
+        path = os.path.join(self.directory, filename)
+        claimed = f'{path}.{os.getpid()}.inherited'
+        try:
+            # Renaming is atomic, so only one collecting process takes it over.
+            os.rename(path, claimed)
+        except OSError:
+            return None
+        try:
+            with open(claimed) as snapshot:
+                data = json.load(snapshot)
+        except (OSError, ValueError):
+            return claimed
+        counters, _, histograms = merge([
+            {'counters': data.get('counters', []), 'histograms': data.get('histograms', [])},
+        ])
+        with self._lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (counts, total, count) in histograms.items():
+                previous = self.histograms.get(key) or ([0] * len(counts), 0, 0)
+                self.histograms[key] = (
+                    [a + b for a, b in zip(previous[0], counts)],
+                    previous[1] + total,
+                    previous[2] + count,
+                )
+        return claimed
+
+    def collect(self):
+        """Return the snapshots of every process, this one included."""
+        if not self.directory:
+            return [self.snapshot()]
+        claimed = [
+            self._inherit(filename) for filename in os.listdir(self.directory)
+            if filename.endswith('.json') and self._exited(filename)
+        ]
+        self.flush()
+        for path in filter(None, claimed):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as snapshot:
+                    snapshots.append(json.load(snapshot))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def merge(snapshots):
+    """Sum snapshots into counter, gauge and histogram dicts keyed by name and labels."""
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for values, kind in ((counters, 'counters'), (gauges, 'gauges')):
+            for name, labels, value in snapshot.get(kind, []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                values[key] = values.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            previous = histograms.get(key) or ([0] * len(counts), 0, 0)
+            histograms[key] = (
+                [a + b for a, b in zip(previous[0], counts)],
+                previous[1] + total,
+                previous[2] + count,
+            )
+    return counters, gauges, histograms
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(snapshots):
+    """Render snapshots in the Prometheus text exposition format."""
+    counters, gauges, histograms = merge(snapshots)
+    lines = []
+    for kind, metrics, values in (('counter', COUNTERS, counters), ('gauge', GAUGES, gauges)):
+        for name, help_text in metrics.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (key_name, labels), value in sorted(values.items()):
+                if key_name == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (key_name, labels), (counts, total, count) in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _build_registry():
+    options = getattr(settings, 'METRICS', {})
+    directory = options.get('DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return MetricsRegistry(directory=directory, flush_interval=options.get('FLUSH_INTERVAL', 5))
+
+
+registry = _build_registry()
@@ -0,0 +1,272 @@
+"""
+Middleware for the app.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError
+from django.http import HttpResponse
+
+from core import memory, profiling
+from core.db import routers
+from core.metrics import registry
+from core.timing import start_request, end_request
+
+
+logger = logging.getLogger('core.timing')
+
+
+class RequestTimingMiddleware:
+    """
+    Record DB, serializer, renderer and total time of each request.
+
+    Timings are sent back in a Server-Timing header, logged as one JSON
+    line per request and added to the process metrics. A sampled fraction
+    of requests also has its memory traced. Streamed bodies are produced
+    after the middleware returns, so their time is not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.REQUEST_TIMING['ENABLED']
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        timings, token = start_request(request)
+        trace = memory.start_trace()
+        try:
+            response = self.get_response(request)
+        finally:
+            if trace is not None:
+                trace.stop()
+            end_request(token)
+        return self._report(request, response, timings, trace, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        timings, token = start_request(request)
+        trace = memory.start_trace()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if trace is not None:
+                trace.stop()
+            end_request(token)
+        return self._report(request, response, timings, trace, time.perf_counter() - start)
+
+    def _report(self, request, response, timings, trace, total):
+        """Add the Server-Timing header, metrics and log line for a response."""
+        durations = {'db': timings.db_time, **timings.sections, 'total': total}
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.2f}'
+            + (f';desc="{timings.db_count} queries"' if name == 'db' else '')
+            for name, seconds in durations.items()
+        )
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        registry.observe_request(
+            view, request.method, response.status_code, total,
+            None if response.streaming else len(response.content),
+            timings.db_count,
+        )
+        if trace is not None:
+            registry.observe_memory(view, trace.peak, trace.sites)
+        if logger.isEnabledFor(logging.INFO):
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'db_queries': timings.db_count,
+                **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in durations.items()},
+            }
+            if trace is not None:
+                record['peak_memory_bytes'] = trace.peak
+                record['allocation_sites'] = dict(trace.sites)
+            logger.info(json.dumps(record))
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Profile requests carrying a signed token from the profile_token command.
+
+    The token is sent in an X-Profile header or a _profile query parameter.
+    X-Profile-Mode (or _profile_mode) picks cprofile or sample. The profile
+    is written to PROFILER['DIR'] when set and returned in place of the
+    response otherwise. Requests without a token only pay for a dict lookup.
+    Under ASGI the profile covers everything the event loop ran while the
+    request was in progress.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILER['ENABLED']
+        # cProfile and the sampler both expect to be the only profiler.
+        self._lock = threading.Lock()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _token(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token is None and '_profile=' in request.META.get('QUERY_STRING', ''):
+            token = request.GET.get('_profile')
+        return token
+
+    def _check(self, request):
+        """Return the profiling mode of request, or an error response."""
+        if not profiling.check_token(self._token(request)):
+            return None, HttpResponse('Invalid profiling token.', status=403)
+        mode = request.META.get('HTTP_X_PROFILE_MODE') or request.GET.get('_profile_mode', 'cprofile')
+        if mode not in profiling.MODES:
+            return None, HttpResponse(f"Profile mode must be one of {', '.join(profiling.MODES)}.", status=400)
+        return mode, None
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled or self._token(request) is None:
+            return self.get_response(request)
+        mode, error = self._check(request)
+        if error is not None:
+            return error
+        if not self._lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile'] = 'busy'
+            return response
+        try:
+            profiler = profiling.RequestProfiler(mode, settings.PROFILER['SAMPLE_INTERVAL'])
+            response = profiler.run(self.get_response, request)
+        finally:
+            self._lock.release()
+        return self._respond(request, response, profiler)
+
+    async def __acall__(self, request):
+        if not self.enabled or self._token(request) is None:
+            return await self.get_response(request)
+        mode, error = await sync_to_async(self._check)(request)
+        if error is not None:
+            return error
+        if not self._lock.acquire(blocking=False):
+            response = await self.get_response(request)
+            response['X-Profile'] = 'busy'
+            return response
+        try:
+            profiler = profiling.RequestProfiler(mode, settings.PROFILER['SAMPLE_INTERVAL'])
+            response = await profiler.arun(self.get_response, request)
+        finally:
+            self._lock.release()
+        return self._respond(request, response, profiler)
+
+    def _respond(self, request, response, profiler):
+        """Save the profile, or return it in place of the response."""
+        match = request.resolver_match
+        name = (match.view_name if match else 'unmatched').replace(':', '-')
+        directory = settings.PROFILER['DIR']
+        if directory:
+            response['X-Profile-File'] = profiler.save(directory, name)
+            return response
+        profile = HttpResponse(profiler.artifact(), content_type=profiler.content_type)
+        profile['Content-Disposition'] = f'attachment; filename="{name}.{profiler.extension}"'
+        return profile
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let the replica router send reads of safe requests to a replica.
+
+    Clients that wrote are pinned to the primary for STICKY_SECONDS so they
+    read their own writes. Clients are told apart by their Authorization
+    header or session cookie, so the lazy request.user is never evaluated.
+    """
+    sync_capable = True
+    async_capable = True
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(settings.READ_REPLICAS['ALIASES'])
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _pin_key(self, request):
+        credential = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not credential:
+            return None
+        return 'replica-pin:' + hashlib.md5(credential.encode()).hexdigest()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        cache = caches[settings.READ_REPLICAS['CACHE_ALIAS']]
+        pin_key = self._pin_key(request)
+        use_replica = request.method in self.safe_methods and not (
+            pin_key and cache.get(pin_key)
+        )
+        state, token = routers.start_request(use_replica)
+        request.replica_route = state
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        if state.wrote and pin_key:
+            cache.set(pin_key, True, settings.READ_REPLICAS['STICKY_SECONDS'])
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        cache = caches[settings.READ_REPLICAS['CACHE_ALIAS']]
+        pin_key = self._pin_key(request)
+        use_replica = request.method in self.safe_methods and not (
+            pin_key and await cache.aget(pin_key)
+        )
+        state, token = routers.start_request(use_replica)
+        request.replica_route = state
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        if state.wrote and pin_key:
+            await cache.aset(pin_key, True, settings.READ_REPLICAS['STICKY_SECONDS'])
+        return response
+
+    def process_exception(self, request, exception):
+        state = getattr(request, 'replica_route', None)
+        if (
+            isinstance(exception, OperationalError)
+            and state is not None
+            and state.replica not in (None, 'default')
+        ):
+            routers.mark_unhealthy(state.replica)
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold duplicate (user, name) rows into the oldest one."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        column = f'{model_name.lower()}_id'
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep=models.Min('id'), total=models.Count('id'))
+            .filter(total__gt=1)
+        )
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            others = list(
+                model.objects.filter(
+                    user_id=duplicate['user_id'],
+                    name=duplicate['name'],
+                ).exclude(id=keep).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{column: keep})
+                .values_list('recipe_id', flat=True)
+            )
+            recipe_ids = set(
+                through.objects.filter(**{f'{column}__in': others})
+                .values_list('recipe_id', flat=True)
+            ) - linked
+            through.objects.bulk_create(
+                [through(recipe_id=recipe_id, **{column: keep}) for recipe_id in recipe_ids]
+            )
+            model.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
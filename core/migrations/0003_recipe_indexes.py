@@ -0,0 +1,42 @@
+# Generated by Django 4.1.4 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+THROUGH_INDEXES = (
+    ('tags', 'tag', 'recipe_tags_tag_recipe_idx'),
+    ('ingredients', 'ingredient', 'recipe_ingr_ingr_recipe_idx'),
+)
+
+
+def _through_indexes(apps):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, column, name in THROUGH_INDEXES:
+        through = getattr(Recipe, field_name).through
+        yield through, models.Index(fields=[column, 'recipe'], name=name)
+
+
+def add_through_indexes(apps, schema_editor):
+    """Index the auto-created through tables for reverse lookups."""
+    for through, index in _through_indexes(apps):
+        schema_editor.add_index(through, index)
+
+
+def remove_through_indexes(apps, schema_editor):
+    for through, index in _through_indexes(apps):
+        schema_editor.remove_index(through, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_merge_duplicate_tags_and_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+        migrations.RunPython(add_through_indexes, remove_through_indexes),
+    ]
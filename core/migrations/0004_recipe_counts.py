@@ -0,0 +1,55 @@
+# Generated by Django 4.1.4 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_recipe_counts(apps, schema_editor):
+    """Count the existing recipe links of every tag and ingredient."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        column = f'{model_name.lower()}_id'
+        counts = through.objects.filter(**{column: models.OuterRef('pk')}) \
+            .values(column).annotate(total=models.Count('pk')).values('total')
+        model.objects.update(
+            recipe_count=Coalesce(models.Subquery(counts), 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name', 'recipe_count'], name='ingr_user_name_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'recipe_count'], name='tag_user_name_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),
+        ),
+        migrations.RunPython(populate_recipe_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.4 on 2026-10-18 18:47
+
+import core.sharding
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_recipe_counts'),
+    ]
+
+    operations = [
+        # Existing users keep their data on the default database, shard 0.
+        migrations.AddField(
+            model_name='user',
+            name='shard',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='shard',
+            field=models.PositiveSmallIntegerField(db_index=True, default=core.sharding.pick_shard),
+        ),
+    ]
@@ -3,11 +3,14 @@ Database models.
 """
 import uuid
 import os
+from collections import defaultdict
 
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
+from core.sharding import assign_ids, pick_shard
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
@@ -43,29 +46,129 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    shard = models.PositiveSmallIntegerField(default=pick_shard, db_index=True)
     objects = UserManager()
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet of recipe data, whose new rows get ids unique across shards."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        assign_ids(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class ShardedModel(models.Model):
+    """Recipe data stored on its user's shard, see core.sharding."""
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if assign_ids([self]):
+            kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+
+class IdSequence(models.Model):
+    """Next id to reserve for a sharded model, kept on the default database."""
+    name = models.CharField(max_length=100, primary_key=True)
+    next_id = models.BigIntegerField()
+
+
+class RecipeAttrManager(models.Manager.from_queryset(ShardedQuerySet)):
+    """Manager for user owned recipe attributes."""
+
+    def get_or_create_many(self, user, names):
+        """Return objects for names, creating the missing ones in bulk."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        found = {obj.name: obj for obj in self.filter(user=user, name__in=names)}
+        missing = [name for name in names if name not in found]
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            found.update(
+                (obj.name, obj)
+                for obj in self.filter(user=user, name__in=missing)
+            )
+        # Case insensitive collations match rows spelled differently, and
+        # accent insensitive ones in ways casefold() cannot tell, so the
+        # database resolves whatever is left one name at a time.
+        folded = {name.casefold(): obj for name, obj in found.items()}
+        objs = []
+        for name in names:
+            obj = found.get(name) or folded.get(name.casefold())
+            if obj is None:
+                obj = self.get(user=user, name=name)
+            objs.append(obj)
+        return objs
+
+    def adjust_recipe_counts(self, deltas):
+        """Apply {pk: delta} changes to recipe_count, one query per delta."""
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                pks_by_delta[delta].append(pk)
+        for delta, pks in pks_by_delta.items():
+            self.filter(pk__in=pks).update(
+                recipe_count=models.F('recipe_count') + delta,
+            )
+
+
+class Tag(ShardedModel):
     """Tag for filtering recipes."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    recipe_count = models.IntegerField(default=0)
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name', 'recipe_count'], name='tag_user_name_count_idx'),
+            models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(ShardedModel):
     """Ingredient for recipes."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    recipe_count = models.IntegerField(default=0)
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name', 'recipe_count'], name='ingr_user_name_count_idx'),
+            models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(ShardedModel):
     """Recipe object."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -77,5 +180,10 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField(Ingredient)
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ]
+
     def __str__(self):
         return self.title
@@ -0,0 +1,142 @@
+"""
+On-demand profiling of individual requests.
+"""
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+
+SIGNER_SALT = 'core.profiling'
+
+MODES = ('cprofile', 'sample')
+
+
+def make_token(user):
+    """Return a signed profiling token for a staff user."""
+    return signing.TimestampSigner(salt=SIGNER_SALT).sign(str(user.pk))
+
+
+def check_token(token):
+    """Return True when token was signed for an active staff user and has not expired."""
+    try:
+        user_id = signing.TimestampSigner(salt=SIGNER_SALT).unsign(
+            token, max_age=settings.PROFILER['MAX_AGE'],
+        )
+    except signing.BadSignature:
+        return False
+    return get_user_model().objects.filter(
+        pk=user_id, is_staff=True, is_active=True,
+    ).exists()
+
+
+class Sampler:
+    """Statistical profiler sampling the stack of the calling thread."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling the current thread."""
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the samples in collapsed stack format for flame graphs."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def short_path(filename):
+    for root in sorted(sys.path, key=len, reverse=True):
+        if root and filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+class RequestProfiler:
+    """Profile one call with cProfile or the sampler and export the result."""
+
+    def __init__(self, mode='cprofile', interval=0.001):
+        self.mode = mode
+        self.interval = interval
+
+    def run(self, func, *args):
+        """Call func under the profiler and return its result."""
+        if self.mode == 'sample':
+            self.profiler = Sampler(self.interval)
+            self.profiler.start()
+            try:
+                return func(*args)
+            finally:
+                self.profiler.stop()
+        self.profiler = cProfile.Profile()
+        return self.profiler.runcall(func, *args)
+
+    async def arun(self, func, *args):
+        """Await func under the profiler, which sees the whole event loop thread."""
+        if self.mode == 'sample':
+            self.profiler = Sampler(self.interval)
+            self.profiler.start()
+            try:
+                return await func(*args)
+            finally:
+                self.profiler.stop()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        try:
+            return await func(*args)
+        finally:
+            self.profiler.disable()
+
+    @property
+    def extension(self):
+        return 'folded' if self.mode == 'sample' else 'prof'
+
+    @property
+    def content_type(self):
+        return 'text/plain' if self.mode == 'sample' else 'application/octet-stream'
+
+    def artifact(self):
+        """Return collapsed stacks, or pstats data loadable with pstats.Stats."""
+        if self.mode == 'sample':
+            return self.profiler.collapsed().encode()
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def save(self, directory, name):
+        """Write the artifact to directory and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        filename = f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{uuid.uuid4().hex[:8]}.{self.extension}'
+        path = os.path.join(directory, filename)
+        with open(path, 'wb') as profile:
+            profile.write(self.artifact())
+        return path
@@ -0,0 +1,317 @@
+"""
+User based sharding of the recipe data.
+
+Users, tokens and the rest of the auth data live on the default database.
+Each user's recipes, tags, ingredients and their links live on the shard
+given by User.shard, an index into SHARDING['ALIASES'] whose first entry
+is the default database. Users are mirrored onto their shard so foreign
+keys to them stay valid there.
+
+Recipes, tags and ingredients take their ids from sequences on the default
+database once there is more than one shard, so ids stay unique across
+shards and a user keeps them when moved. They do on databases that cannot
+report the ids of a bulk insert too, MySQL among them, so bulk_create()
+always sets the primary keys. Routing and move coordination go
+through SHARDING['CACHE_ALIAS'], which must be shared by every process for
+rebalance_shards to reach the app servers.
+"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+
+SHARDED_MODELS = {'recipe', 'tag', 'ingredient', 'recipe_tags', 'recipe_ingredients'}
+
+# Lifetime of a user's count of writes in progress, longer than any request.
+WRITES_TIMEOUT = 600
+
+_shard = contextvars.ContextVar('shard', default=None)
+
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+class UserMoving(APIException):
+    """Raised for writes to the data of a user being moved between shards."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your recipes are being moved, try again shortly.'
+    default_code = 'user_moving'
+
+
+def shard_aliases():
+    """Return the database alias of every shard, by shard index."""
+    return settings.SHARDING['ALIASES']
+
+
+def is_sharded(model):
+    """Return True for models stored on their user's shard."""
+    return model._meta.app_label == 'core' and model._meta.model_name in SHARDED_MODELS
+
+
+def pick_shard():
+    """Return the shard index for a new user."""
+    return random.choice(settings.SHARDING['OPEN'])
+
+
+def alias_for_shard(index):
+    """Return the database alias of a shard index."""
+    return shard_aliases()[index]
+
+
+def db_for_user(user):
+    """Return the database alias holding a user's recipe data."""
+    return alias_for_shard(user.shard)
+
+
+def routing_cache():
+    """Return the cache shared by every process for routing and moves."""
+    return caches[settings.SHARDING['CACHE_ALIAS']]
+
+
+def db_for_user_id(user_id):
+    """Return the shard alias of a user id, cached between calls."""
+    if len(shard_aliases()) == 1:
+        return DEFAULT_DB_ALIAS
+    key = f'user-shard:{user_id}'
+    index = routing_cache().get(key)
+    if index is None:
+        from django.contrib.auth import get_user_model
+        index = get_user_model().objects.using(DEFAULT_DB_ALIAS) \
+            .values_list('shard', flat=True).get(pk=user_id)
+        routing_cache().set(key, index, settings.SHARDING['CACHE_TIMEOUT'])
+    return alias_for_shard(index)
+
+
+def forget_user(user_id):
+    """Drop the cached shard of a user after it moved."""
+    routing_cache().delete(f'user-shard:{user_id}')
+
+
+def start_write(user_id):
+    """
+    Count a write to a user's recipe data and return the alias to write to.
+
+    Raises UserMoving while the user is being moved. Every start_write()
+    that returns must be paired with end_write(). With a single shard no
+    user can move, so nothing is counted.
+    """
+    if len(shard_aliases()) == 1:
+        return DEFAULT_DB_ALIAS
+    cache = routing_cache()
+    key = f'user-writes:{user_id}'
+    cache.add(key, 0, WRITES_TIMEOUT)
+    cache.incr(key)
+    # Counted before checking, so a move either waits for this write or
+    # this write sees the move.
+    if cache.get(f'user-moving:{user_id}'):
+        end_write(user_id)
+        raise UserMoving()
+    return db_for_user_id(user_id)
+
+
+def end_write(user_id):
+    """Undo start_write()."""
+    if len(shard_aliases()) == 1:
+        return
+    try:
+        routing_cache().decr(f'user-writes:{user_id}')
+    except ValueError:
+        # The count expired, see WRITES_TIMEOUT.
+        pass
+
+
+@contextmanager
+def writing(user_id):
+    """Count a write to a user's recipe data and route the block to its shard."""
+    alias = start_write(user_id)
+    try:
+        with use_shard(alias):
+            yield alias
+    finally:
+        end_write(user_id)
+
+
+@contextmanager
+def moving(user_id):
+    """
+    Refuse a user's writes in the block, once the writes in progress finish.
+
+    Raises TimeoutError if they are still running after
+    SHARDING['MOVE_TIMEOUT'] seconds.
+    """
+    cache = routing_cache()
+    cache.set(f'user-moving:{user_id}', True, None)
+    try:
+        deadline = time.monotonic() + settings.SHARDING['MOVE_TIMEOUT']
+        while cache.get(f'user-writes:{user_id}', 0) > 0:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'Writes of user {user_id} are still in progress.')
+            time.sleep(0.1)
+        yield
+    finally:
+        # Again, in case a request cached the old shard while the user moved.
+        forget_user(user_id)
+        cache.delete(f'user-moving:{user_id}')
+
+
+def _sequence_connection():
+    """Return the connection reserving ids, and whether it is the shared one."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    # SQLite has a single writer, so a connection of its own would wait for
+    # the caller's transaction. Elsewhere reservations commit on their own
+    # and are never rolled back with the caller's transaction, which keeps
+    # the ids handed out by _id_blocks from being reserved twice.
+    if primary.vendor == 'sqlite':
+        return primary, True
+    return connections.create_connection(DEFAULT_DB_ALIAS), False
+
+
+@contextmanager
+def _sequence_transaction(connection, shared):
+    if shared:
+        with transaction.atomic(using=connection.alias):
+            yield
+        return
+    connection.set_autocommit(False)
+    try:
+        yield
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def reserve_ids(model, count):
+    """
+    Reserve count consecutive ids for new rows of a sharded model and
+    return the first one.
+
+    Ids start past the highest on the default database, where rows got
+    auto increment ids while it was the only shard.
+    """
+    from core.models import IdSequence
+    connection, shared = _sequence_connection()
+    quote = connection.ops.quote_name
+    sequences = quote(IdSequence._meta.db_table)
+    name = model._meta.label_lower
+    lock = ' FOR UPDATE' if connection.features.has_select_for_update else ''
+    try:
+        with _sequence_transaction(connection, shared), connection.cursor() as cursor:
+            cursor.execute(f'SELECT next_id FROM {sequences} WHERE name = %s{lock}', [name])
+            row = cursor.fetchone()
+            cursor.execute(f'SELECT MAX({quote(model._meta.pk.column)}) FROM {quote(model._meta.db_table)}')
+            first = max(row[0] if row else 1, (cursor.fetchone()[0] or 0) + 1)
+            if row:
+                cursor.execute(
+                    f'UPDATE {sequences} SET next_id = %s WHERE name = %s', [first + count, name],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {sequences} (name, next_id) VALUES (%s, %s)', [name, first + count],
+                )
+    except IntegrityError:
+        # Another process created the sequence first.
+        return reserve_ids(model, count)
+    return first
+
+
+def allocate_ids(model, count):
+    """Return count ids for new rows of a sharded model, reserved in blocks."""
+    name = model._meta.label_lower
+    with _id_lock:
+        first, end = _id_blocks.get(name, (0, 0))
+        if end - first < count:
+            size = max(count, settings.SHARDING['ID_BLOCK_SIZE'])
+            first = reserve_ids(model, size)
+            end = first + size
+        _id_blocks[name] = (first + count, end)
+    return range(first, first + count)
+
+
+def allocates_ids():
+    """Return True when sharded rows take their ids from the sequences."""
+    if len(shard_aliases()) > 1:
+        return True
+    return not connections[DEFAULT_DB_ALIAS].features.can_return_rows_from_bulk_insert
+
+
+def assign_ids(objs):
+    """
+    Give the new rows among objs ids from the sequences and return whether
+    there were any. Without allocates_ids() rows keep their auto increment
+    ids.
+    """
+    objs = [obj for obj in objs if obj.pk is None]
+    if not objs or not allocates_ids():
+        return False
+    for obj, pk in zip(objs, allocate_ids(type(objs[0]), len(objs))):
+        obj.pk = pk
+    return True
+
+
+def current_shard():
+    """Return the shard alias activated for the current context, or None."""
+    return _shard.get()
+
+
+def activate(alias):
+    """Route sharded queries of the current context to alias."""
+    return _shard.set(alias)
+
+
+def deactivate(token):
+    """Undo activate()."""
+    _shard.reset(token)
+
+
+@contextmanager
+def use_shard(user_or_alias):
+    """Route sharded queries in the block to a user's shard or to an alias."""
+    alias = user_or_alias if isinstance(user_or_alias, str) else db_for_user(user_or_alias)
+    token = activate(alias)
+    try:
+        yield alias
+    finally:
+        deactivate(token)
+
+
+class ShardedViewMixin:
+    """
+    Route the sharded queries of a view to the authenticated user's shard.
+
+    Unsafe requests count as writes, see start_write().
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            return
+        if request.method in SAFE_METHODS:
+            alias = db_for_user(request.user)
+        else:
+            alias = start_write(request.user.pk)
+            self._writer_id = request.user.pk
+        self._shard_token = activate(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            deactivate(token)
+            self._shard_token = None
+        writer_id = getattr(self, '_writer_id', None)
+        if writer_id is not None:
+            end_write(writer_id)
+            self._writer_id = None
+        return super().finalize_response(request, response, *args, **kwargs)
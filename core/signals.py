@@ -0,0 +1,124 @@
+"""
+Signal handlers for the core models.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import sharding, slow_queries, timing
+from core.authentication import token_cache
+from core.models import Recipe
+
+
+@receiver(connection_created)
+def install_query_timing(sender, connection, **kwargs):
+    """Time the queries of requests on every new database connection."""
+    timing.install(connection)
+
+
+@receiver(connection_created)
+def install_slow_query_capture(sender, connection, **kwargs):
+    """Capture slow queries on every new database connection."""
+    slow_queries.install(connection)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Drop a cached token in every worker when it is changed or revoked."""
+    token_cache.invalidate(instance.key)
+    token_cache.invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    """Drop cached tokens when their user is changed or deleted."""
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def mirror_user_to_shard(sender, instance, using, **kwargs):
+    """Copy a user to its shard so its recipe data can reference it there."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    sharding.forget_user(instance.pk)
+    alias = sharding.db_for_user(instance)
+    if alias != DEFAULT_DB_ALIAS:
+        copy.copy(instance).save(using=alias)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_from_shard(sender, instance, using, **kwargs):
+    """Delete a user's mirror, and with it its recipe data, from its shard."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    sharding.forget_user(instance.pk)
+    alias = sharding.db_for_user(instance)
+    if alias != DEFAULT_DB_ALIAS:
+        get_user_model()._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def _link_column(through):
+    """Return the through column pointing at the tag or ingredient."""
+    return next(
+        field.attname for field in through._meta.fields
+        if field.is_relation and field.related_model is not Recipe
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_counts(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    """Keep recipe_count in step with the recipe through tables."""
+    if not reverse:
+        if action == 'pre_clear':
+            instance._cleared_links = list(
+                sender.objects.using(using).filter(recipe_id=instance.pk)
+                .values_list(_link_column(sender), flat=True)
+            )
+        elif action == 'post_clear':
+            cleared = getattr(instance, '_cleared_links', [])
+            model.objects.db_manager(using).adjust_recipe_counts(dict.fromkeys(cleared, -1))
+        elif action == 'pre_remove':
+            # remove() accepts objects that are not linked at all, so only
+            # the links about to be deleted are counted.
+            column = _link_column(sender)
+            links = sender.objects.using(using).filter(
+                recipe_id=instance.pk, **{f'{column}__in': pk_set},
+            ).values(column)
+            model.objects.using(using).filter(pk__in=links).update(
+                recipe_count=F('recipe_count') - 1,
+            )
+        elif action == 'post_add':
+            model.objects.db_manager(using).adjust_recipe_counts(dict.fromkeys(pk_set, 1))
+    elif action == 'post_clear':
+        type(instance).objects.using(using).filter(pk=instance.pk).update(recipe_count=0)
+    elif action == 'pre_remove':
+        instance._removed_links = sender.objects.using(using).filter(
+            recipe_id__in=pk_set, **{_link_column(sender): instance.pk},
+        ).count()
+    elif action == 'post_remove':
+        removed = getattr(instance, '_removed_links', 0)
+        type(instance).objects.db_manager(using).adjust_recipe_counts({instance.pk: -removed})
+    elif action == 'post_add':
+        type(instance).objects.db_manager(using).adjust_recipe_counts({instance.pk: len(pk_set)})
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_counts(sender, instance, using, **kwargs):
+    """Decrement the counts of a deleted recipe's tags and ingredients."""
+    for field_name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        links = through.objects.using(using).filter(recipe_id=instance.pk) \
+            .values(_link_column(through))
+        field.related_model.objects.using(using).filter(pk__in=links).update(
+            recipe_count=F('recipe_count') - 1,
+        )
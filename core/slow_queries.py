@@ -0,0 +1,157 @@
+"""
+Capture of slow database queries with their view and call site.
+"""
+import contextvars
+import os
+import time
+import traceback
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, transaction
+
+from core import timing
+
+
+_capturing = contextvars.ContextVar('slow_query_capturing', default=False)
+
+# Frames from Django and from the execute wrappers are skipped when looking
+# for the call site.
+_SKIPPED_PATHS = (
+    os.path.dirname(django.__file__),
+    os.path.abspath(__file__),
+    os.path.abspath(timing.__file__),
+)
+
+
+class SlowQueryLog:
+    """
+    Bounded ring buffer of slow queries kept in a cache.
+
+    A cache counter hands out sequence numbers and entries are stored in
+    max_entries slots, so every worker writes to the same buffer and the
+    oldest entries are overwritten first. The cache must be shared between
+    processes for the buffer to be, see core.checks.
+    """
+
+    def __init__(self, alias='default', max_entries=100, timeout=86400, prefix='slow-queries'):
+        self.alias = alias
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _slot_key(self, slot):
+        return f'{self.prefix}:{slot}'
+
+    def append(self, entry):
+        """Store entry, overwriting the oldest one when the buffer is full."""
+        counter = f'{self.prefix}:seq'
+        self.cache.add(counter, 0, timeout=None)
+        try:
+            seq = self.cache.incr(counter)
+        except ValueError:
+            self.cache.set(counter, 1, timeout=None)
+            seq = 1
+        self.cache.set(
+            self._slot_key(seq % self.max_entries), {**entry, 'seq': seq}, self.timeout,
+        )
+
+    def entries(self):
+        """Return the stored entries, newest first."""
+        keys = [self._slot_key(slot) for slot in range(self.max_entries)]
+        found = self.cache.get_many(keys).values()
+        return sorted(found, key=lambda entry: entry['seq'], reverse=True)
+
+    def clear(self):
+        """Drop every stored entry."""
+        self.cache.delete_many(
+            [f'{self.prefix}:seq'] + [self._slot_key(slot) for slot in range(self.max_entries)]
+        )
+
+
+def _call_site():
+    """Return the innermost project frame as file:line in function."""
+    for frame, lineno in traceback.walk_stack(None):
+        filename = frame.f_code.co_filename
+        if filename.startswith(_SKIPPED_PATHS) or 'site-packages' in filename:
+            continue
+        return f'{os.path.relpath(filename, settings.BASE_DIR)}:{lineno} in {frame.f_code.co_name}'
+    return None
+
+
+def _explain(connection, sql, params):
+    """Return the plan of sql, or the error raised while explaining it."""
+    explain_sql = f'{connection.ops.explain_query_prefix()} {sql}'
+    try:
+        # A failed EXPLAIN must not break the caller's transaction.
+        with transaction.atomic(using=connection.alias, savepoint=connection.in_atomic_block):
+            with connection.cursor() as cursor:
+                cursor.execute(explain_sql, params)
+                return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    """Execute wrapper recording queries slower than the configured threshold."""
+    options = settings.SLOW_QUERIES
+    if _capturing.get() or not options['ENABLED']:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+
+    if duration * 1000 < options['THRESHOLD_MS']:
+        return result
+
+    token = _capturing.set(True)
+    try:
+        connection = context['connection']
+        timings = timing.current_timings()
+        request = timings.request if timings else None
+        match = getattr(request, 'resolver_match', None)
+        entry = {
+            'sql': sql,
+            'params': repr(params)[:2000],
+            'many': many,
+            'duration_ms': round(duration * 1000, 2),
+            'alias': connection.alias,
+            'view': match.view_name if match else None,
+            'path': request.path if request else None,
+            'call_site': _call_site(),
+            'time': time.time(),
+            'plan': None,
+        }
+        if options['EXPLAIN'] and not many and sql.lstrip()[:6].upper() == 'SELECT':
+            entry['plan'] = _explain(connection, sql, params)
+        slow_query_log.append(entry)
+    finally:
+        _capturing.reset(token)
+    return result
+
+
+def install(connection):
+    """Add the slow query wrapper to a new database connection."""
+    # Installed even when disabled, so the setting can be turned on without
+    # reconnecting.
+    if capture_slow_queries not in connection.execute_wrappers:
+        # Connections are often opened inside an execute_wrapper() block,
+        # which pops the last wrapper on exit, so this one goes first.
+        connection.execute_wrappers.insert(0, capture_slow_queries)
+
+
+def _build_log():
+    options = getattr(settings, 'SLOW_QUERIES', {})
+    return SlowQueryLog(
+        alias=options.get('CACHE_ALIAS', 'default'),
+        max_entries=options.get('MAX_ENTRIES', 100),
+    )
+
+
+slow_query_log = _build_log()
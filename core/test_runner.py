@@ -0,0 +1,25 @@
+"""
+Test runner for the project.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests with all users on the default database.
+
+    Extra shards are still created and migrated, but only tests that
+    override SHARDING route data to them, so the other tests do not depend
+    on where new users happen to be placed.
+    """
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        self._sharding = settings.SHARDING
+        settings.SHARDING = {**settings.SHARDING, 'ALIASES': ['default'], 'OPEN': [0]}
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        settings.SHARDING = self._sharding
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,81 @@
+"""
+Test helpers shared by the API test suites.
+"""
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core import sharding
+from core.authentication import token_cache
+
+
+@contextmanager
+def without_bulk_insert_ids():
+    """
+    Act like a database that cannot report the ids of a bulk insert, as
+    MySQL does, so new rows take their ids from the sequences.
+    """
+    with patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+            patch.dict(sharding._id_blocks, clear=True):
+        yield
+
+
+def file_based_caches(location):
+    """Return CACHES with a 'shared' file based cache stored in location."""
+    return {
+        **settings.CACHES,
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        },
+    }
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting an endpoint stays within a query budget.
+
+    The request is repeated after growing the data set to each size in
+    budget_sizes, so a budget only passes if the count does not grow
+    with the number of objects.
+    """
+    budget_sizes = (1, 10, 100)
+
+    def clear_request_caches(self):
+        """Drop cached responses and tokens so every query is counted."""
+        for cache in caches.all():
+            cache.clear()
+        token_cache.clear()
+
+    def assertQueryBudget(self, budget, make_request, populate=None, sizes=None):
+        """
+        Assert make_request() runs at most budget queries at every size.
+
+        populate(size) is called before each request and should make sure
+        size objects exist for it to act on.
+        """
+        counts = {}
+        for size in sizes or self.budget_sizes:
+            if populate is not None:
+                populate(size)
+            self.clear_request_caches()
+            with CaptureQueriesContext(connection) as captured:
+                response = make_request()
+            self.assertLess(
+                response.status_code, 400,
+                f'Request failed at size {size}: {response.status_code}',
+            )
+            counts[size] = len(captured)
+            self.assertLessEqual(
+                len(captured), budget,
+                f'{len(captured)} queries at size {size}, budget is {budget}:\n'
+                + '\n'.join(query['sql'] for query in captured.captured_queries),
+            )
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'Query count grows with the number of objects: {counts}',
+        )
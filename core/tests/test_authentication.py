@@ -0,0 +1,161 @@
+"""
+Tests for the cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache
+from core.checks import check_token_auth_cache
+
+
+ME_URL = reverse('user:me')
+
+TOKEN_AUTH_CACHE = {**settings.TOKEN_AUTH_CACHE, 'ENABLED': True}
+
+
+@override_settings(TOKEN_AUTH_CACHE=TOKEN_AUTH_CACHE)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with cached tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_hit_cache(self):
+        """Test the token lookup query only runs on the first request."""
+        self.client.get(ME_URL)
+
+        # Only the view's fresh load of the user is left.
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(token_cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_disabled_cache_not_used(self):
+        """Test tokens are looked up on every request unless the cache is enabled."""
+        with override_settings(TOKEN_AUTH_CACHE={**TOKEN_AUTH_CACHE, 'ENABLED': False}):
+            self.client.get(ME_URL)
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats(), {'hits': 0, 'misses': 0, 'size': 0})
+
+    def test_revoked_token_rejected(self):
+        """Test deleting a token invalidates the cached entry."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user invalidates their cached tokens."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_refreshes_cached_user(self):
+        """Test changes to the user are visible on the next request."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'Updated Name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated Name')
+
+    def test_update_does_not_write_back_cached_user(self):
+        """Test updating the user saves fields of the current row, not the cached copy."""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(password='changed-elsewhere')
+
+        res = self.client.patch(ME_URL, {'name': 'Updated Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, 'changed-elsewhere')
+        self.assertEqual(self.user.name, 'Updated Name')
+
+
+@override_settings(TOKEN_AUTH_CACHE=TOKEN_AUTH_CACHE)
+class TokenCacheTests(TestCase):
+    """Test the token cache."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.tokens = [Token(key=f'key{i}', user=self.user) for i in range(3)]
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache drops the least recently used entry when full."""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('key0', self.tokens[0])
+        cache.set('key1', self.tokens[1])
+        cache.get('key0')
+        cache.set('key2', self.tokens[2])
+
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key2'))
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are not returned after their time to live."""
+        cache = TokenCache(max_size=2, ttl=60)
+        patched_monotonic.return_value = 100
+        cache.set('key0', self.tokens[0])
+
+        patched_monotonic.return_value = 161
+
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_cached_user_is_copied(self):
+        """Test callers cannot modify the cached user."""
+        cache = TokenCache()
+        cache.set('key0', self.tokens[0])
+
+        cache.get('key0').user.name = 'Changed'
+
+        self.assertEqual(cache.get('key0').user.name, '')
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test invalidating a user drops entries cached by another process."""
+        cache = TokenCache()
+        other_worker = TokenCache()
+        cache.set('key0', self.tokens[0])
+
+        other_worker.invalidate_user(self.user.pk)
+
+        self.assertIsNone(cache.get('key0'))
+
+    def test_check_requires_shared_cache(self):
+        """Test enabling the cache with a per-process cache is a configuration error."""
+        errors = check_token_auth_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E005'])
+        with override_settings(TOKEN_AUTH_CACHE={**TOKEN_AUTH_CACHE, 'ENABLED': False}):
+            self.assertEqual(check_token_auth_cache(None), [])
@@ -0,0 +1,110 @@
+"""
+Tests for the API benchmark runner.
+"""
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+
+from core import benchmark
+from core.db.pool import pool_stats
+
+
+class BenchmarkTests(TestCase):
+    """Test percentiles, baseline comparison and the benchmark command."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        samples = list(range(1, 101))
+
+        self.assertEqual(benchmark.percentile(samples, 50), 50)
+        self.assertEqual(benchmark.percentile(samples, 99), 99)
+        self.assertEqual(benchmark.percentile([3], 95), 3)
+        self.assertEqual(benchmark.percentile([], 50), 0.0)
+
+    def test_compare_flags_regressions(self):
+        """Test slower latency, more queries and lower throughput regress."""
+        baseline = {'recipes@10': {
+            'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30,
+            'throughput_rps': 100, 'queries': 3, 'peak_memory_kb': 100,
+        }}
+        results = {'recipes@10': {
+            'p50_ms': 11, 'p95_ms': 30, 'p99_ms': 30,
+            'throughput_rps': 70, 'queries': 4, 'peak_memory_kb': 100,
+        }}
+
+        regressions = benchmark.compare(results, baseline, threshold=0.2)
+
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(any('p95_ms' in line for line in regressions))
+        self.assertTrue(any('queries' in line for line in regressions))
+        self.assertTrue(any('throughput_rps' in line for line in regressions))
+        self.assertEqual(benchmark.compare(results, {}, threshold=0.2), [])
+
+    def test_benchmark_command(self):
+        """Test the command saves a baseline, compares it and cleans up."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'baseline.json')
+            call_command(
+                'benchmark_api', sizes='3', iterations=2, warmup=1,
+                save=path, stdout=StringIO(),
+            )
+
+            results = benchmark.load_baseline(path)
+            self.assertEqual(
+                set(results),
+                {f'{endpoint.name}@3' for endpoint in benchmark.ENDPOINTS},
+            )
+            for metrics in results.values():
+                self.assertEqual(set(metrics), set(benchmark.METRICS))
+            self.assertFalse(get_user_model().objects.exists())
+
+            for metrics in results.values():
+                metrics['p95_ms'] = 0.0001
+            benchmark.save_baseline(path, results)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_api', sizes='3', iterations=2, warmup=1,
+                    baseline=path, stdout=StringIO(),
+                )
+
+    def test_benchmark_unknown_endpoint(self):
+        """Test an unknown endpoint name is rejected."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', endpoints='nope', stdout=StringIO())
+
+
+class ServerBenchmarkTests(TransactionTestCase):
+    """Test the WSGI and ASGI concurrency benchmark."""
+
+    def test_benchmark_servers_command(self):
+        """Test every endpoint is measured in every mode and the user is cleaned up."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'servers.json')
+            call_command(
+                'benchmark_servers', size=2, concurrency='2', requests=4,
+                save=path, stdout=StringIO(),
+            )
+
+            results = benchmark.load_baseline(path)
+        self.assertEqual(set(results), {
+            f'{endpoint.name}@{mode}-c2'
+            for endpoint in benchmark.SERVER_ENDPOINTS
+            for mode in benchmark.SERVER_MODES
+        })
+        for metrics in results.values():
+            self.assertEqual(set(metrics), set(benchmark.SERVER_METRICS))
+        self.assertFalse(get_user_model().objects.exists())
+        connections.close_all()
+        for alias, stats in pool_stats().items():
+            self.assertEqual(stats['in_use'], 0, f'{alias} pool still has connections checked out')
+
+    def test_benchmark_servers_unknown_mode(self):
+        """Test an unknown server mode is rejected."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_servers', modes='cgi', stdout=StringIO())
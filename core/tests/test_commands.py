@@ -1,34 +1,219 @@
 """
 Test custom Django management commands.
 """
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
+import json
+import os
+import tempfile
 
-from psycopg2 import OperationalError as Psycopg2OpError
-
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.core.management.base import CommandError
+from django.db.utils import InterfaceError, OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Recipe, Tag, Ingredient
 
 
-@patch('core.management.commands.wait_for_db.Command.check')
+@patch('core.management.commands.wait_for_db.Command.check_database')
 class CommandTests(SimpleTestCase):
     """Test commands."""
 
     def test_wait_for_db_ready(self, patched_check):
-        """Test waiting for database if database ready."""
-        patched_check.return_value = True
-
-        call_command('wait_for_db')
+        """Test waiting for every database if they are ready."""
+        call_command('wait_for_db', stdout=StringIO())
 
-        patched_check.assert_called_once_with(databases=['default'])
+        self.assertEqual(
+            sorted(call.args[0] for call in patched_check.call_args_list),
+            sorted(settings.DATABASES),
+        )
 
     @patch('time.sleep')
     def test_wait_for_db_delay(self, patched_sleep, patched_check):
         """Test waiting for database when getting OperationalError."""
-        patched_check.side_effect = [Psycopg2OpError] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_check.side_effect = [InterfaceError] * 2 + \
+            [OperationalError] * 3 + [None]
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', databases='default', stdout=StringIO())
 
         self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(len(delays), 5)
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, min(5, 0.1 * 2 ** attempt))
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """Test the command fails once the deadline has passed."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaisesMessage(CommandError, 'Database default'):
+            call_command('wait_for_db', timeout=0.05, stdout=StringIO(), stderr=StringIO())
+
+    def test_wait_for_db_other_errors_raised(self, patched_check):
+        """Test errors that are not connection errors are not retried."""
+        patched_check.side_effect = ZeroDivisionError
+
+        with self.assertRaises(ZeroDivisionError):
+            call_command('wait_for_db', databases='default', stdout=StringIO())
+
+        patched_check.assert_called_once()
+
+    def test_wait_for_db_unknown_alias(self, patched_check):
+        """Test unknown database aliases are rejected."""
+        with self.assertRaisesMessage(CommandError, 'Unknown databases: missing'):
+            call_command('wait_for_db', databases='missing', stdout=StringIO())
+
+    @patch('time.sleep')
+    @patch('core.management.commands.wait_for_db.Command.check_storage')
+    def test_wait_for_cache_and_storage(self, patched_storage, patched_sleep, patched_check):
+        """Test caches and storage are waited for when asked."""
+        patched_storage.side_effect = [OSError, None]
+        out = StringIO()
+
+        call_command('wait_for_db', caches=True, storage=True, stdout=out)
+
+        self.assertEqual(patched_storage.call_count, 2)
+        self.assertIn('Cache default available', out.getvalue())
+        self.assertIn('Storage available', out.getvalue())
+
+
+class CheckQueryPlansTests(TestCase):
+    """Test the query plan check command."""
+
+    def test_query_plans_use_indexes(self):
+        """Test the viewset queries avoid full scans and filesorts."""
+        call_command('check_query_plans', stdout=StringIO())
+
+    @patch('django.db.models.query.QuerySet.explain')
+    def test_full_scan_fails(self, patched_explain):
+        """Test a plan with a full table scan fails the command."""
+        patched_explain.return_value = '2 0 0 SCAN core_recipe'
+
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', stdout=StringIO())
+
+
+class RebuildRecipeCountsTests(TestCase):
+    """Test the recipe count rebuild command."""
+    databases = '__all__'
+
+    def test_rebuild_recipe_counts(self):
+        """Test drifted counts are recomputed from the through table."""
+        user = get_user_model().objects.create_user('user@example.com', 'pass123')
+        tags = [Tag.objects.create(user=user, name=f'Tag{i}') for i in range(3)]
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Sample',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        recipe.tags.add(tags[0])
+        Tag.objects.update(recipe_count=7)
+
+        call_command('rebuild_recipe_counts', batch_size=2, stdout=StringIO())
+
+        counts = dict(Tag.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'Tag0': 1, 'Tag1': 0, 'Tag2': 0})
+
+
+class ImportRecipesTests(TestCase):
+    """Test the NDJSON recipe import command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com', 'pass123')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, 'recipes.ndjson')
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.50',
+             'tags': [{'name': 'Dinner'}, {'name': f'Tag {i}'}],
+             'ingredients': [{'name': 'Salt'}]}
+            for i in range(5)
+        ]
+        lines = [json.dumps(record) for record in records]
+        lines.insert(2, json.dumps({'title': 'Missing fields'}))
+        lines.insert(4, 'not json')
+        with open(self.path, 'w') as ndjson:
+            ndjson.write('\n'.join(lines) + '\n')
+
+    def _import(self, **options):
+        call_command(
+            'import_recipes', self.path, user=self.user.email,
+            stdout=StringIO(), stderr=StringIO(), **options,
+        )
+
+    def test_import_recipes(self):
+        """Test valid lines are imported in batches and invalid ones skipped."""
+        self._import(batch_size=2)
+
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(Tag.objects.get(user=self.user, name='Dinner').recipe_count, 5)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(recipes.get(title='Recipe 3').tags.count(), 2)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test a second run with the same checkpoint imports nothing again."""
+        checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.json')
+
+        self._import(batch_size=3, checkpoint=checkpoint)
+        self._import(batch_size=3, checkpoint=checkpoint)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+        with open(checkpoint) as saved:
+            self.assertEqual(json.load(saved), {'line': 7})
+
+    def test_import_with_worker_processes(self):
+        """Test validation can be fanned out to worker processes."""
+        self._import(batch_size=2, workers=2)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+
+    def test_import_unknown_user(self):
+        """Test importing for a missing user fails."""
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', self.path, user='nobody@example.com')
+
+
+class SeedDataTests(TestCase):
+    """Test the synthetic data generator command."""
+
+    def _seed(self, **options):
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def _snapshot(self):
+        return [
+            (recipe.title, recipe.price, sorted(t.name for t in recipe.tags.all()))
+            for recipe in Recipe.objects.order_by('id').prefetch_related('tags')
+        ]
+
+    def test_seed_data(self):
+        """Test users, recipes and links are created with consistent counts."""
+        self._seed(users=3, recipes_per_user=4, tags_per_user=5,
+                   ingredients_per_user=6, distribution='fixed', batch_size=5)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Recipe.objects.count(), 12)
+        self.assertEqual(Recipe.tags.through.objects.count(), 12 * 3)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 12 * 6)
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.recipe_count, tag.recipe_set.count())
+        for ingredient in Ingredient.objects.all():
+            self.assertEqual(ingredient.recipe_count, ingredient.recipe_set.count())
+        user = get_user_model().objects.first()
+        self.assertTrue(user.check_password('seedpass123'))
+
+    def test_seed_data_is_deterministic(self):
+        """Test the same seed produces the same dataset."""
+        self._seed(users=4, seed=7)
+        first = self._snapshot()
+        get_user_model().objects.all().delete()
+
+        self._seed(users=4, seed=7)
+
+        self.assertEqual(self._snapshot(), first)
+        self.assertTrue(first)
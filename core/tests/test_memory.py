@@ -0,0 +1,74 @@
+"""
+Tests for sampled memory tracing.
+"""
+import json
+import tracemalloc
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import memory
+from core.metrics import registry
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def memory_settings(rate):
+    """Return MEMORY_TRACING settings sampling rate of requests."""
+    return {'SAMPLE_RATE': rate, 'FRAMES': 1, 'TOP_SITES': 5}
+
+
+class MemoryTracingTests(TestCase):
+    """Test memory tracing of sampled requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        for index in range(5):
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {index}', time_minutes=5, price=Decimal('1.00'),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _traced_requests(self):
+        key = ('memory_traced_requests_total', (('view', 'recipe:recipe-list'),))
+        return registry.counters.get(key, 0)
+
+    @override_settings(MEMORY_TRACING=memory_settings(1.0))
+    def test_sampled_request_is_traced(self):
+        """Test peak memory and allocation sites are logged and aggregated."""
+        before = self._traced_requests()
+
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['peak_memory_bytes'], 0)
+        self.assertTrue(record['allocation_sites'])
+        self.assertLessEqual(len(record['allocation_sites']), 5)
+        self.assertEqual(self._traced_requests(), before + 1)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    @override_settings(MEMORY_TRACING=memory_settings(0))
+    def test_not_sampled(self):
+        """Test tracemalloc is not started when sampling is off."""
+        with patch('core.memory.tracemalloc.start') as start:
+            self.client.get(RECIPES_URL)
+
+        start.assert_not_called()
+
+    @override_settings(MEMORY_TRACING=memory_settings(1.0))
+    def test_skipped_while_already_tracing(self):
+        """Test requests are not traced while tracemalloc is in use elsewhere."""
+        tracemalloc.start()
+        try:
+            self.assertIsNone(memory.start_trace())
+        finally:
+            tracemalloc.stop()
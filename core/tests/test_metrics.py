@@ -0,0 +1,164 @@
+"""
+Tests for the Prometheus metrics.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.checks import check_metrics_dir
+
+
+METRICS = {**settings.METRICS, 'TOKEN': 'scrape-token'}
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MetricsRegistryTests(TestCase):
+    """Test aggregating and rendering metrics."""
+
+    def test_render_histogram(self):
+        """Test histogram buckets are cumulative with sum and count."""
+        registry = metrics.MetricsRegistry()
+        registry.observe_request('recipe:recipe-list', 'GET', 200, 0.02, 300, 3)
+        registry.observe_request('recipe:recipe-list', 'GET', 200, 20, 100, 3)
+
+        text = metrics.render([registry.snapshot()])
+
+        labels = 'view="recipe:recipe-list"'
+        self.assertIn(
+            f'http_requests_total{{method="GET",status="200",{labels}}} 2', text,
+        )
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="10"}} 1', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'db_queries_per_request_sum{{{labels}}} 6', text)
+        self.assertIn('# TYPE http_response_size_bytes histogram', text)
+        self.assertIn('cache_requests_total{cache="token",result="hit"}', text)
+
+    def test_collect_merges_processes(self):
+        """Test snapshots written by several processes are summed."""
+        with tempfile.TemporaryDirectory() as directory:
+            for pid in (100, 101):
+                registry = metrics.MetricsRegistry(directory=directory)
+                registry.inc('http_requests_total', {'view': 'v', 'method': 'GET', 'status': '200'})
+                registry.observe('db_queries_per_request', {'view': 'v'}, 4)
+                with patch('core.metrics.os.getpid', return_value=pid):
+                    registry.flush()
+
+            with patch('core.metrics.os.getpid', return_value=101):
+                counters, _, histograms = metrics.merge(registry.collect())
+
+        key = ('http_requests_total', (('method', 'GET'), ('status', '200'), ('view', 'v')))
+        self.assertEqual(counters[key], 2)
+        counts, total, count = histograms[('db_queries_per_request', (('view', 'v'),))]
+        self.assertEqual((total, count), (8, 2))
+        self.assertEqual(counts[4], 2)
+
+    @skipUnless(os.name == 'posix', 'Process liveness is only checked on POSIX.')
+    def test_collect_takes_over_exited_processes(self):
+        """Test an exited process' counters are kept once and its gauges dropped."""
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'{socket.gethostname()}-{exited.pid}.json')
+            with open(path, 'w') as snapshot:
+                json.dump({
+                    'counters': [['http_requests_total', [['view', 'v']], 3]],
+                    'gauges': [['db_pool_connections', [['alias', 'exited'], ['state', 'idle']], 5]],
+                    'histograms': [],
+                }, snapshot)
+            registry = metrics.MetricsRegistry(directory=directory)
+
+            registry.collect()
+            counters, gauges, _ = metrics.merge(registry.collect())
+
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(counters[('http_requests_total', (('view', 'v'),))], 3)
+        self.assertNotIn(('db_pool_connections', (('alias', 'exited'), ('state', 'idle'))), gauges)
+
+
+@override_settings(METRICS=METRICS)
+class MetricsViewTests(TestCase):
+    """Test the metrics endpoint."""
+
+    def test_requests_are_counted(self):
+        """Test requests handled by the middleware show up in the metrics."""
+        user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get(RECIPES_URL)
+
+        res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer scrape-token')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertRegex(
+            res.content.decode(),
+            r'http_requests_total\{method="GET",status="200",view="recipe:recipe-list"\} [1-9]',
+        )
+
+    def test_credentials_required(self):
+        """Test the metrics are not served without the token or a staff user."""
+        user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        client = APIClient()
+        client.force_login(user)
+
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            res = client.get(METRICS_URL, **headers)
+
+            self.assertEqual(res.status_code, 401)
+            self.assertEqual(res['WWW-Authenticate'], 'Bearer')
+        with override_settings(METRICS={**METRICS, 'TOKEN': None}):
+            res = APIClient().get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(res.status_code, 401)
+
+    def test_staff_user_allowed(self):
+        """Test staff users logged in to the admin can read the metrics."""
+        user = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')
+        client = APIClient()
+        client.force_login(user)
+
+        res = client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_single_process_noted(self):
+        """Test the response says it only covers one process without METRICS_DIR."""
+        client = APIClient()
+        headers = {'HTTP_AUTHORIZATION': 'Bearer scrape-token'}
+
+        with override_settings(METRICS={**METRICS, 'DIR': None}):
+            res = client.get(METRICS_URL, **headers)
+        self.assertTrue(res.content.decode().startswith(f'# Metrics of process {os.getpid()} only'))
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={**METRICS, 'DIR': directory}):
+            res = client.get(METRICS_URL, **headers)
+        self.assertNotIn('only', res.content.decode().splitlines()[0])
+
+    def test_check_requires_dir_for_workers(self):
+        """Test several workers without METRICS['DIR'] fail the system check."""
+        with override_settings(METRICS={**METRICS, 'DIR': None, 'WORKERS': 4}):
+            errors = check_metrics_dir(None)
+        self.assertEqual([error.id for error in errors], ['core.E006'])
+
+        with override_settings(METRICS={**METRICS, 'DIR': '/tmp/metrics', 'WORKERS': 4}):
+            self.assertEqual(check_metrics_dir(None), [])
+        with override_settings(METRICS={**METRICS, 'DIR': None, 'WORKERS': 1}):
+            self.assertEqual(check_metrics_dir(None), [])
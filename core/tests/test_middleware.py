@@ -0,0 +1,85 @@
+"""
+Tests for the request timing middleware.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import timing
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def parse_server_timing(header):
+    """Return the metrics of a Server-Timing header by name."""
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Test timings are reported for each request."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        Recipe.objects.create(
+            user=self.user, title='Recipe', time_minutes=5, price=Decimal('1.00'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test the header reports db, serializer, render and total time."""
+        res = self.client.get(RECIPES_URL)
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(set(metrics), {'db', 'serializer', 'render', 'total'})
+        self.assertRegex(metrics['db']['desc'], r'^"[1-9]\d* queries"$')
+        self.assertGreater(float(metrics['serializer']['dur']), 0)
+        self.assertGreater(float(metrics['render']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['render']['dur']),
+        )
+
+    def test_structured_log_line(self):
+        """Test each request is logged as one JSON line."""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'recipe:recipe-list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertIn('serializer_ms', record)
+
+    @override_settings(REQUEST_TIMING={'ENABLED': False})
+    def test_disabled(self):
+        """Test no header is added when timing is disabled."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_nested_sections_counted_once(self):
+        """Test a section nested in itself is only timed by the outer block."""
+        timings, token = timing.start_request()
+        try:
+            with timing.timed('render'):
+                with timing.timed('render'):
+                    pass
+        finally:
+            timing.end_request(token)
+
+        self.assertGreater(timings.sections['render'], 0)
+        self.assertIsNone(timing.current_timings())
@@ -4,6 +4,7 @@ Tests for models.
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -90,6 +91,108 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Tag1')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Tag1')
+
+    def test_get_or_create_many(self):
+        """Test resolving names reuses existing rows and creates the rest."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        existing = models.Ingredient.objects.create(user=user, name='Salt')
+        models.Ingredient.objects.create(user=other_user, name='Pepper')
+
+        with self.assertNumQueries(3):
+            ingredients = models.Ingredient.objects.get_or_create_many(
+                user,
+                ['Pepper', 'Salt', 'Pepper'],
+            )
+
+        self.assertEqual([i.name for i in ingredients], ['Pepper', 'Salt'])
+        self.assertEqual(ingredients[1], existing)
+        self.assertEqual(ingredients[0].user, user)
+        self.assertEqual(models.Ingredient.objects.filter(user=user).count(), 2)
+
+    def test_get_or_create_many_collation_match(self):
+        """Test a name the collation matches to a differently spelled row resolves to it."""
+        user = create_user()
+        cafe = models.Tag.objects.create(user=user, name='Cafe')
+        # Under an accent insensitive collation the insert conflicts and the
+        # re-query returns the existing row under its own spelling.
+        missing = models.Tag.objects.none()
+        matched = models.Tag.objects.filter(pk=cafe.pk)
+
+        with patch.object(models.RecipeAttrManager, 'bulk_create'), \
+                patch.object(models.RecipeAttrManager, 'filter', side_effect=[missing, matched]), \
+                patch.object(models.RecipeAttrManager, 'get', return_value=cafe) as patched_get:
+            tags = models.Tag.objects.get_or_create_many(user, ['Café'])
+
+        self.assertEqual(tags, [cafe])
+        patched_get.assert_called_once_with(user=user, name='Café')
+
+    def test_recipe_counts_follow_links(self):
+        """Test recipe_count tracks adding, removing and clearing links."""
+        user = create_user()
+        tag1 = models.Tag.objects.create(user=user, name='Tag1')
+        tag2 = models.Tag.objects.create(user=user, name='Tag2')
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample recipe name',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+
+        recipe.tags.add(tag1, tag2)
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.recipe_count, 1)
+
+        recipe.tags.remove(tag1)
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.recipe_count, 0)
+
+        recipe.tags.clear()
+        tag2.refresh_from_db()
+        self.assertEqual(tag2.recipe_count, 0)
+
+        tag1.recipe_set.add(recipe)
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.recipe_count, 1)
+
+        recipe.delete()
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.recipe_count, 0)
+
+    def test_removing_unlinked_objects_keeps_counts(self):
+        """Test removing a tag or recipe that was never linked changes no count."""
+        user = create_user()
+        linked = models.Tag.objects.create(user=user, name='Linked')
+        unlinked = models.Tag.objects.create(user=user, name='Unlinked')
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample recipe name',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        other = models.Recipe.objects.create(
+            user=user,
+            title='Other recipe name',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe.tags.add(linked)
+
+        recipe.tags.remove(linked, unlinked)
+        unlinked.recipe_set.remove(other)
+
+        self.assertEqual(
+            list(models.Tag.objects.order_by('name').values_list('recipe_count', flat=True)),
+            [0, 0],
+        )
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generating image path."""
@@ -0,0 +1,166 @@
+"""
+Tests for the database connection pool.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout, close_pools, pool_stats
+
+
+def check(connection):
+    connection.execute('SELECT 1')
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test checkout, release, limits and health checks."""
+
+    def _pool(self, **options):
+        pool = ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False),
+                              check=check, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        """Test a released connection is handed out again."""
+        pool = self._pool()
+
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(), connection)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['checkouts'], stats['in_use']), (1, 2, 1))
+
+    def test_min_size(self):
+        """Test fill opens min_size connections up front."""
+        pool = self._pool(min_size=3)
+
+        pool.fill()
+
+        self.assertEqual(pool.stats()['idle'], 3)
+
+    def test_timeout_when_exhausted(self):
+        """Test acquire gives up after the timeout when the pool is full."""
+        pool = self._pool(max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['timeouts']), (1, 1))
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting acquire is woken up by a release."""
+        pool = self._pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+
+        pool.release(connection)
+        waiter.join(5)
+
+        self.assertEqual(acquired, [connection])
+
+    def test_expired_connections_are_replaced(self):
+        """Test connections older than max_lifetime are closed."""
+        pool = self._pool(max_lifetime=0)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.stats()['closed'], 1)
+
+    def test_unhealthy_connections_are_replaced(self):
+        """Test a connection failing its health check is not handed out."""
+        pool = self._pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.close()
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Test the pooled SQLite backend returns connections to its pool."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(close_pools)
+        self.handler = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            'pooled': {
+                'ENGINE': 'core.db.backends.sqlite3',
+                'NAME': os.path.join(self.tmpdir.name, 'pool.sqlite3'),
+                'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+            },
+            'memory': {
+                'ENGINE': 'core.db.backends.sqlite3',
+                'NAME': 'file:memorydb_pool?mode=memory&cache=shared',
+                'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+            },
+        })
+
+    def _query_in_threads(self, alias, count):
+        """Open, query and close a connection to alias in count threads, one after another."""
+        errors = []
+
+        def query():
+            wrapper = self.handler[alias]
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                wrapper.close()
+            except Exception as exc:
+                errors.append(exc)
+
+        for _ in range(count):
+            thread = threading.Thread(target=query)
+            thread.start()
+            thread.join()
+        return errors
+
+    def test_close_returns_connection_to_pool(self):
+        """Test closing and reconnecting reuses the same DB-API connection."""
+        wrapper = self.handler.create_connection('pooled')
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+
+        wrapper.ensure_connection()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+        self.assertIs(wrapper.connection, raw)
+        self.assertEqual(pool_stats()['pooled']['created'], 1)
+        wrapper.close()
+
+    def test_exhausted_pool_raises_operational_error(self):
+        """Test a pool timeout surfaces as a database OperationalError."""
+        first = self.handler.create_connection('pooled')
+        second = self.handler.create_connection('pooled')
+        first.ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        first.close()
+
+    def test_threads_return_connections(self):
+        """Test more threads than MAX_SIZE can connect one after another."""
+        self.assertEqual(self._query_in_threads('pooled', 3), [])
+        self.assertEqual(pool_stats()['pooled']['created'], 1)
+
+    def test_in_memory_database_not_pooled(self):
+        """Test in-memory databases, whose connections are never closed, bypass the pool."""
+        self.assertEqual(self._query_in_threads('memory', 3), [])
+        self.assertNotIn('memory', pool_stats())
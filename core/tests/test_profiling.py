@@ -0,0 +1,134 @@
+"""
+Tests for on-demand request profiling.
+"""
+import os
+import pstats
+import tempfile
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.profiling import Sampler, make_token
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+PROFILER = {
+    'ENABLED': True,
+    'DIR': None,
+    'MAX_AGE': 60,
+    'SAMPLE_INTERVAL': 0.0005,
+}
+
+
+def busy_wait(seconds):
+    """Spin for seconds so the sampler has something to see."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@override_settings(PROFILER=PROFILER)
+class ProfilerMiddlewareTests(TestCase):
+    """Test requests are profiled only with a valid token."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            'staff@example.com', 'testpass123', is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_cprofile_inline(self):
+        """Test the pstats data is returned in place of the response."""
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE=make_token(self.staff))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/octet-stream')
+        with tempfile.NamedTemporaryFile(suffix='.prof') as profile:
+            profile.write(res.content)
+            profile.flush()
+            stream = StringIO()
+            pstats.Stats(profile.name, stream=stream).print_stats('views.py')
+        self.assertIn('list', stream.getvalue())
+
+    def test_sample_to_directory(self):
+        """Test collapsed stacks are written to the profile directory."""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILER={**PROFILER, 'DIR': directory}):
+                res = self.client.get(RECIPES_URL, {
+                    '_profile': make_token(self.staff),
+                    '_profile_mode': 'sample',
+                })
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json(), [])
+            path = res['X-Profile-File']
+            self.assertEqual(os.path.dirname(path), directory)
+            self.assertTrue(path.endswith('.folded'))
+            with open(path) as folded:
+                for line in folded:
+                    self.assertRegex(line, r'^\S.* \d+$')
+
+    def test_without_token(self):
+        """Test requests without a token are served normally."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-File', res)
+
+    def test_invalid_tokens(self):
+        """Test forged, expired and non-staff tokens are rejected."""
+        user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        token = make_token(self.staff)
+
+        for bad_token in ['nope', token + 'x', make_token(user)]:
+            res = self.client.get(RECIPES_URL, HTTP_X_PROFILE=bad_token)
+            self.assertEqual(res.status_code, 403)
+        with override_settings(PROFILER={**PROFILER, 'MAX_AGE': -1}):
+            res = self.client.get(RECIPES_URL, HTTP_X_PROFILE=token)
+        self.assertEqual(res.status_code, 403)
+
+    def test_invalid_mode(self):
+        """Test an unknown profile mode is rejected."""
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_X_PROFILE=make_token(self.staff),
+            HTTP_X_PROFILE_MODE='perf',
+        )
+
+        self.assertEqual(res.status_code, 400)
+
+
+class ProfilingTests(TestCase):
+    """Test the sampler and the token command."""
+
+    def test_sampler(self):
+        """Test the sampler records the stack of the sampled thread."""
+        sampler = Sampler(interval=0.0005)
+        sampler.start()
+        busy_wait(0.05)
+        sampler.stop()
+
+        self.assertIn('busy_wait', sampler.collapsed())
+
+    def test_profile_token_command(self):
+        """Test tokens are only issued to staff users."""
+        staff = get_user_model().objects.create_user(
+            'staff@example.com', 'testpass123', is_staff=True,
+        )
+        get_user_model().objects.create_user('user@example.com', 'testpass123')
+        out = StringIO()
+
+        call_command('profile_token', staff.email, stdout=out, stderr=StringIO())
+
+        self.assertTrue(out.getvalue().strip().startswith(f'{staff.pk}:'))
+        with self.assertRaises(CommandError):
+            call_command('profile_token', 'user@example.com', stdout=StringIO())
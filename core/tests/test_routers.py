@@ -0,0 +1,189 @@
+"""
+Tests for read replica routing.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.checks import check_replica_cache, check_replica_sticky_seconds
+from core.db import routers
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+READ_REPLICAS = {
+    'ALIASES': ['replica_0', 'replica_1'],
+    'STICKY_SECONDS': 15,
+    'MAX_LAG_SECONDS': 10,
+    'CHECK_INTERVAL': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+
+@override_settings(READ_REPLICAS=READ_REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the router's choice of database."""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        patcher = patch('core.db.routers.replica_is_healthy', side_effect=self._healthy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.healthy = {'replica_0'}
+
+    def _healthy(self, alias):
+        return alias in self.healthy
+
+    def _read_in_request(self, use_replica=True):
+        state, token = routers.start_request(use_replica)
+        try:
+            return self.router.db_for_read(Recipe), state
+        finally:
+            routers.end_request(token)
+
+    def test_outside_request_reads_primary(self):
+        """Test reads outside a routed request go to the primary."""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_safe_request_reads_replica(self):
+        """Test a safe request reads from a healthy replica."""
+        alias, _ = self._read_in_request()
+
+        self.assertEqual(alias, 'replica_0')
+
+    def test_unsafe_request_reads_primary(self):
+        """Test a request not allowed on replicas reads from the primary."""
+        alias, _ = self._read_in_request(use_replica=False)
+
+        self.assertEqual(alias, 'default')
+
+    def test_reads_after_write_use_primary(self):
+        """Test a request reads its own writes once it has written."""
+        state, token = routers.start_request(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica_0')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+        finally:
+            routers.end_request(token)
+
+        self.assertTrue(state.wrote)
+
+    def test_credentials_read_primary(self):
+        """Test users and tokens are read from the primary, which has new ones first."""
+        state, token = routers.start_request(True)
+        try:
+            for model in (get_user_model(), Token):
+                self.assertEqual(self.router.db_for_read(model), 'default')
+        finally:
+            routers.end_request(token)
+
+    def test_unhealthy_replicas_fall_back_to_primary(self):
+        """Test the primary is used when no replica is healthy."""
+        self.healthy = set()
+
+        alias, _ = self._read_in_request()
+
+        self.assertEqual(alias, 'default')
+
+    def test_primary_transaction_reads_primary(self):
+        """Test reads inside a transaction on the primary stay there."""
+        with patch.object(connections['default'], 'in_atomic_block', True):
+            alias, _ = self._read_in_request()
+
+        self.assertEqual(alias, 'default')
+
+    def test_only_primary_is_migrated(self):
+        """Test replicas are never migrated."""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+
+@override_settings(READ_REPLICAS=READ_REPLICAS)
+class ReplicaHealthTests(TestCase):
+    """Test replica health checks."""
+
+    def test_check_replica(self):
+        """Test replicas within the lag limit are healthy."""
+        self.assertTrue(routers.check_replica('default'))
+
+        with patch('core.db.routers.replication_lag', return_value=60):
+            self.assertFalse(routers.check_replica('default'))
+        with patch('core.db.routers.replication_lag', side_effect=DatabaseError):
+            self.assertFalse(routers.check_replica('default'))
+
+    def test_unknown_lag_is_unhealthy(self):
+        """Test a replica that reports no lag, as a stopped one does, is unhealthy."""
+        with patch('core.db.routers.replication_lag', return_value=None):
+            self.assertFalse(routers.check_replica('default'))
+
+    def test_check_sticky_seconds_cover_lag(self):
+        """Test pins shorter than the lag a replica may reach are a configuration error."""
+        self.assertEqual(check_replica_sticky_seconds(None), [])
+
+        with override_settings(READ_REPLICAS={**READ_REPLICAS, 'STICKY_SECONDS': 14}):
+            errors = check_replica_sticky_seconds(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E003'])
+
+    def test_check_requires_shared_cache(self):
+        """Test configuring replicas with a per-process pin cache is a configuration error."""
+        errors = check_replica_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+        with override_settings(READ_REPLICAS={**READ_REPLICAS, 'ALIASES': []}):
+            self.assertEqual(check_replica_cache(None), [])
+
+    def test_mark_unhealthy(self):
+        """Test a replica marked unhealthy stays out until its next check."""
+        self.addCleanup(routers._health.clear)
+        routers.mark_unhealthy('replica_0')
+
+        with patch('core.db.routers.check_replica') as check:
+            self.assertFalse(routers.replica_is_healthy('replica_0'))
+        check.assert_not_called()
+
+
+@override_settings(READ_REPLICAS=READ_REPLICAS)
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """Test requests are allowed on replicas unless their client just wrote."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        self.client = self._client(self.user)
+        self.decisions = []
+        start_request = routers.start_request
+
+        def record(use_replica):
+            self.decisions.append(use_replica)
+            return start_request(use_replica)
+
+        patcher = patch('core.db.routers.start_request', side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _client(self, user):
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def test_read_your_writes(self):
+        """Test a client that wrote is pinned to the primary, others are not."""
+        other = self._client(get_user_model().objects.create_user('other@example.com', 'pass123'))
+
+        self.client.get(RECIPES_URL)
+        self.client.post(RECIPES_URL, {'title': 'New', 'time_minutes': 5, 'price': '1.00'})
+        self.client.get(RECIPES_URL)
+        other.get(RECIPES_URL)
+
+        self.assertEqual(self.decisions, [True, False, False, True])
@@ -0,0 +1,245 @@
+"""
+Tests for user based sharding.
+"""
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.authentication import token_cache
+from core.db.routers import ShardRouter
+from core.models import Recipe, Tag, Ingredient
+from core.testing import file_based_caches
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+SHARDED = 'shard_1' in settings.DATABASES
+
+
+def sharding_settings(**overrides):
+    """Return SHARDING settings for the default database and shard_1."""
+    options = {
+        'ALIASES': ['default', 'shard_1'],
+        'OPEN': [0, 1],
+        'CACHE_TIMEOUT': 300,
+        'CACHE_ALIAS': 'default',
+        'ID_BLOCK_SIZE': 100,
+        'MOVE_TIMEOUT': 0,
+    }
+    options.update(overrides)
+    return options
+
+
+@override_settings(SHARDING=sharding_settings())
+class ShardRouterTests(SimpleTestCase):
+    """Test the router's choice of shard."""
+
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_unsharded_model_not_routed(self):
+        """Test models outside the recipe data are left to other routers."""
+        with sharding.use_shard('shard_1'):
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+
+    def test_active_shard_routes_recipe_data(self):
+        """Test recipe data and its links follow the active shard."""
+        with sharding.use_shard('shard_1'):
+            for model in (Recipe, Tag, Ingredient, Recipe.tags.through):
+                self.assertEqual(self.router.db_for_write(model), 'shard_1')
+
+    def test_default_shard_not_routed(self):
+        """Test the default shard is left to the replica router."""
+        with sharding.use_shard('default'):
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_instance_database_wins(self):
+        """Test an instance loaded from a shard is written back to it."""
+        recipe = Recipe()
+        recipe._state.db = 'shard_1'
+
+        self.assertEqual(self.router.db_for_write(Recipe, instance=recipe), 'shard_1')
+
+    @override_settings(SHARDING=sharding_settings(ALIASES=['default'], OPEN=[0]))
+    def test_single_shard_not_routed(self):
+        """Test nothing is routed without extra shards."""
+        with sharding.use_shard('default'):
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_migrations_allowed_on_shards(self):
+        """Test shards get the full schema."""
+        self.assertTrue(self.router.allow_migrate('shard_1', 'core', 'recipe'))
+        self.assertIsNone(self.router.allow_migrate('replica_0', 'core', 'recipe'))
+
+
+@override_settings(SHARDING=sharding_settings(ALIASES=['default'], OPEN=[0]))
+class SingleShardTests(TestCase):
+    """Test sharding stays out of the way with one database."""
+
+    def test_new_user_on_default_shard(self):
+        """Test users are placed on shard 0 without extra shards."""
+        user = get_user_model().objects.create_user('single@example.com', 'pass123')
+
+        self.assertEqual(user.shard, 0)
+
+    def test_writes_not_counted(self):
+        """Test writes skip the routing cache without extra shards."""
+        with patch('core.sharding.routing_cache') as routing_cache:
+            with sharding.writing(1) as alias:
+                self.assertEqual(alias, 'default')
+
+        routing_cache.assert_not_called()
+
+    def test_rebalance_unknown_shard(self):
+        """Test moving a user to a missing shard is rejected."""
+        get_user_model().objects.create_user('single@example.com', 'pass123')
+
+        with self.assertRaisesMessage(CommandError, 'Shard 1 does not exist.'):
+            call_command('rebalance_shards', user='single@example.com', to=1, stdout=StringIO())
+
+    @override_settings(SHARDING=sharding_settings(OPEN=[0]))
+    def test_rebalance_requires_shared_cache(self):
+        """Test users are not moved while app servers cannot see the move."""
+        get_user_model().objects.create_user('single@example.com', 'pass123')
+
+        with self.assertRaisesMessage(CommandError, 'local to each process'):
+            call_command('rebalance_shards', user='single@example.com', to=1, stdout=StringIO())
+
+    def test_reserved_ids_follow_default_database(self):
+        """Test ids are reserved in order, past rows added while there was one shard."""
+        user = get_user_model().objects.create_user('single@example.com', 'pass123')
+        recipe = Recipe.objects.create(user=user, title='Pie', time_minutes=5, price='1.00')
+
+        first = sharding.reserve_ids(Recipe, 10)
+
+        self.assertGreater(first, recipe.pk)
+        self.assertEqual(sharding.reserve_ids(Recipe, 1), first + 10)
+
+
+@skipUnless(SHARDED, 'Needs a shard_1 database.')
+class MultiShardTests(TestCase):
+    """Test recipe data placement across several databases."""
+    databases = '__all__'
+
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        overrides = override_settings(
+            CACHES=file_based_caches(location.name),
+            SHARDING=sharding_settings(CACHE_ALIAS='shared'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = patch.object(token_cache, 'alias', 'shared')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user('sharded@example.com', 'pass123', shard=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_user_mirrored_to_shard(self):
+        """Test a user is copied to its shard."""
+        mirror = get_user_model().objects.using('shard_1').get(pk=self.user.pk)
+
+        self.assertEqual(mirror.email, self.user.email)
+
+    def test_api_writes_to_user_shard(self):
+        """Test recipes created through the API land on the user's shard."""
+        payload = {
+            'title': 'Soup', 'time_minutes': 10, 'price': '2.50',
+            'tags': [{'name': 'Hot'}], 'ingredients': [{'name': 'Leek'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Recipe.objects.using('default').exists())
+        recipe = Recipe.objects.using('shard_1').get(pk=res.data['id'])
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['Hot'])
+        self.assertEqual(Tag.objects.using('shard_1').get().recipe_count, 1)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.pk])
+
+    def test_rebalance_moves_user(self):
+        """Test moving a user copies its data with links and clears the source."""
+        with sharding.use_shard(self.user):
+            recipe = Recipe.objects.create(user=self.user, title='Pie', time_minutes=5, price='1.00')
+            tag = Tag.objects.create(user=self.user, name='Sweet')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Apple'))
+
+        call_command('rebalance_shards', user=self.user.email, to=0, stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, 0)
+        self.assertFalse(Recipe.objects.using('shard_1').exists())
+        self.assertFalse(get_user_model().objects.using('shard_1').filter(pk=self.user.pk).exists())
+        moved = Recipe.objects.using('default').get(user=self.user)
+        self.assertEqual((moved.pk, moved.title), (recipe.pk, 'Pie'))
+        self.assertEqual(list(moved.tags.values_list('pk', 'name')), [(tag.pk, 'Sweet')])
+        self.assertEqual([item.name for item in moved.ingredients.all()], ['Apple'])
+
+    def test_auto_rebalance_evens_out_shards(self):
+        """Test --auto moves users from the fullest shard to the emptiest."""
+        other = get_user_model().objects.create_user('other@example.com', 'pass123', shard=1)
+        for owner, count in ((self.user, 3), (other, 2)):
+            with sharding.use_shard(owner):
+                for index in range(count):
+                    Recipe.objects.create(user=owner, title=f'R{index}', time_minutes=5, price='1.00')
+
+        call_command('rebalance_shards', auto=True, stdout=StringIO())
+
+        other.refresh_from_db()
+        self.assertEqual(other.shard, 0)
+        self.assertEqual(Recipe.objects.using('default').count(), 2)
+        self.assertEqual(Recipe.objects.using('shard_1').count(), 3)
+
+    def test_ids_unique_across_shards(self):
+        """Test rows on different shards never share an id."""
+        other = get_user_model().objects.create_user('other@example.com', 'pass123', shard=0)
+        recipes = []
+        for owner in (self.user, other, self.user):
+            with sharding.use_shard(owner):
+                recipes.append(Recipe.objects.create(user=owner, title='Pie', time_minutes=5, price='1.00'))
+
+        self.assertEqual(len({recipe.pk for recipe in recipes}), 3)
+
+    def test_writes_refused_while_moving(self):
+        """Test the user's writes answer 503 during a move while reads go on."""
+        payload = {'title': 'Soup', 'time_minutes': 10, 'price': '2.50'}
+
+        with sharding.moving(self.user.pk):
+            self.assertEqual(
+                self.client.post(RECIPES_URL, payload).status_code,
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            self.assertEqual(self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_move_waits_for_writes(self):
+        """Test a move gives up while a write is still in progress."""
+        sharding.start_write(self.user.pk)
+
+        with self.assertRaises(TimeoutError):
+            with sharding.moving(self.user.pk):
+                pass
+
+        sharding.end_write(self.user.pk)
+        with sharding.moving(self.user.pk):
+            self.assertFalse(Recipe.objects.using('shard_1').exists())
@@ -0,0 +1,134 @@
+"""
+Tests for slow query capture.
+"""
+import json
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.checks import check_slow_query_cache
+from core.slow_queries import SlowQueryLog, slow_query_log
+from core.testing import file_based_caches
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SLOW_QUERIES_URL = reverse('admin-slow-queries')
+
+
+def slow_query_settings(**overrides):
+    """Return SLOW_QUERIES settings capturing every query."""
+    options = {
+        'ENABLED': True,
+        'THRESHOLD_MS': 0,
+        'EXPLAIN': False,
+        'MAX_ENTRIES': 100,
+        'CACHE_ALIAS': 'default',
+    }
+    options.update(overrides)
+    return options
+
+
+class SlowQueryTests(TestCase):
+    """Test slow queries are captured with their context."""
+
+    def setUp(self):
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _capture_list(self, **overrides):
+        with override_settings(SLOW_QUERIES=slow_query_settings(**overrides)):
+            self.client.get(RECIPES_URL)
+        return slow_query_log.entries()
+
+    def test_capture_view_and_call_site(self):
+        """Test queries over the threshold record their view and call site."""
+        entries = self._capture_list()
+
+        select = next(entry for entry in entries if 'core_recipe' in entry['sql'])
+        self.assertEqual(select['view'], 'recipe:recipe-list')
+        self.assertEqual(select['path'], RECIPES_URL)
+        self.assertRegex(select['call_site'], r'^(recipe|core)/.+\.py:\d+ in ')
+        self.assertIn(str(self.user.id), select['params'])
+        self.assertIsNone(select['plan'])
+
+    def test_explain(self):
+        """Test EXPLAIN output is stored without capturing the EXPLAIN itself."""
+        entries = self._capture_list(EXPLAIN=True)
+
+        select = next(entry for entry in entries if 'core_recipe' in entry['sql'])
+        self.assertTrue(select['plan'])
+        self.assertFalse(any('EXPLAIN' in entry['sql'] for entry in entries))
+
+    def test_threshold(self):
+        """Test fast queries are not captured."""
+        self.assertEqual(self._capture_list(THRESHOLD_MS=60000), [])
+
+    def test_ring_buffer_is_bounded(self):
+        """Test the oldest entries are overwritten first."""
+        log = SlowQueryLog(max_entries=3, prefix='test-slow-queries')
+        self.addCleanup(log.clear)
+        for index in range(5):
+            log.append({'sql': f'SELECT {index}'})
+
+        self.assertEqual(
+            [entry['sql'] for entry in log.entries()],
+            ['SELECT 4', 'SELECT 3', 'SELECT 2'],
+        )
+
+    def test_admin_page(self):
+        """Test staff can read the slow queries in the admin."""
+        self._capture_list()
+        staff = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')
+        self.client.force_login(staff)
+
+        res = self.client.get(SLOW_QUERIES_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'core_recipe')
+
+    def test_admin_page_requires_staff(self):
+        """Test non-staff users are redirected to the admin login."""
+        self.client.force_login(self.user)
+
+        res = self.client.get(SLOW_QUERIES_URL)
+
+        self.assertEqual(res.status_code, 302)
+
+    @patch.object(slow_query_log, 'alias', 'shared')
+    def test_command(self):
+        """Test the command prints entries as JSON and clears them."""
+        with tempfile.TemporaryDirectory() as location, \
+                override_settings(CACHES=file_based_caches(location)):
+            self._capture_list(CACHE_ALIAS='shared')
+            out = StringIO()
+
+            call_command('slow_queries', json=True, clear=True, stdout=out)
+
+            lines = out.getvalue().splitlines()
+            self.assertTrue(any('core_recipe' in json.loads(line)['sql'] for line in lines[:-1]))
+            self.assertEqual(slow_query_log.entries(), [])
+
+    def test_command_requires_shared_cache(self):
+        """Test the command refuses to read a cache local to its own process."""
+        with self.assertRaisesMessage(CommandError, 'local to each process'):
+            call_command('slow_queries', stdout=StringIO())
+
+    def test_check_requires_shared_cache(self):
+        """Test enabling capture with a per-process cache is a configuration error."""
+        with override_settings(SLOW_QUERIES=slow_query_settings()):
+            errors = check_slow_query_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        with override_settings(SLOW_QUERIES=slow_query_settings(ENABLED=False)):
+            self.assertEqual(check_slow_query_cache(None), [])
@@ -0,0 +1,116 @@
+"""
+Per-request timing of database, serializer and renderer work.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from rest_framework import renderers, serializers
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated durations, in seconds, of one request."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.db_count = 0
+        self.db_time = 0.0
+        self.sections = {'serializer': 0.0, 'render': 0.0}
+        self._active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing each query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_count += 1
+
+
+def start_request(request=None):
+    """Start collecting timings for the current context and return them."""
+    timings = RequestTimings(request)
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    """Stop collecting timings for the current context."""
+    _current.reset(token)
+
+
+def current_timings():
+    """Return the timings of the current request, or None."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper adding each query to the current request's timings.
+
+    The request is found through a context variable, which also reaches
+    the threads the async ORM runs queries in.
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.record_query(execute, sql, params, many, context)
+
+
+def install(connection):
+    """Add the timing wrapper to a new database connection."""
+    if record_query not in connection.execute_wrappers:
+        # See slow_queries.install() for why the wrapper goes first.
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def timed(section):
+    """Add the duration of the block to section of the current request."""
+    timings = _current.get()
+    # Nested blocks of the same section, e.g. the browsable API rendering
+    # JSON, are only counted once.
+    if timings is None or section in timings._active:
+        yield
+        return
+    timings._active.add(section)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.sections[section] = (
+            timings.sections.get(section, 0.0) + time.perf_counter() - start
+        )
+        timings._active.discard(section)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin timing the serialization of data."""
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """List serializer timing the serialization of data."""
+
+
+class TimedJSONRenderer(renderers.JSONRenderer):
+    """JSON renderer timing rendering."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class TimedBrowsableAPIRenderer(renderers.BrowsableAPIRenderer):
+    """Browsable API renderer timing rendering."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -1,11 +1,45 @@
 """
 Core views for app.
 """
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from core.metrics import registry, render
+
 
 @api_view(['GET'])
 def health_check(request):
     """Returns successful response."""
     return Response({'healthy': True})
+
+
+def can_read_metrics(request):
+    """Return whether request is from a staff user or bears METRICS['TOKEN']."""
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS.get('TOKEN')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        credentials.encode(), token.encode(),
+    )
+
+
+def metrics(request):
+    """Returns the metrics of all processes in Prometheus text format."""
+    if not can_read_metrics(request):
+        response = HttpResponse('Authentication required.', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    text = render(registry.collect())
+    if not settings.METRICS.get('DIR'):
+        text = (
+            f'# Metrics of process {os.getpid()} only, '
+            'set METRICS_DIR to report every worker.\n' + text
+        )
+    return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,18 @@
+"""
+URL mappings for the async recipe APIs.
+"""
+from django.urls import path
+
+from recipe import async_views
+
+
+app_name = 'recipe-async'
+
+urlpatterns = [
+    path('recipes/', async_views.RecipeListView.as_view(), name='recipe-list'),
+    path('recipes/<int:pk>/', async_views.RecipeDetailView.as_view(), name='recipe-detail'),
+    path('tags/', async_views.tag_list, name='tag-list'),
+    path('tags/<int:pk>/', async_views.tag_detail, name='tag-detail'),
+    path('ingredients/', async_views.ingredient_list, name='ingredient-list'),
+    path('ingredients/<int:pk>/', async_views.ingredient_detail, name='ingredient-detail'),
+]
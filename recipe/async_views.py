@@ -0,0 +1,222 @@
+"""
+Native async views for the recipe APIs.
+
+They serve the list, retrieve, create and update endpoints of recipes,
+tags and ingredients under /api/async/recipe/ and answer like the DRF
+views, with the same cursor pagination but without the response cache.
+Reads use the async ORM; prefetching, pages and token authentication run
+in one thread hop each, since aiterator() cannot prefetch. Django 4.1 has
+no async transactions or related manager writes, so validation and saving
+go through the DRF serializers in one thread hop per write.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router, transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.views import View
+
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, ParseError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+
+from core.authentication import CachedTokenAuthentication
+from core.models import Recipe, Tag, Ingredient
+from core.sharding import db_for_user, end_write, start_write, use_shard
+from core.timing import TimedJSONRenderer
+from recipe import serializers
+from recipe.filters import attr_ordering, filter_attrs, filter_recipes
+from recipe.pagination import RecipeAttrCursorPagination, RecipeCursorPagination
+
+
+async def authenticate(request):
+    """Return the user of a token request and None, or None and an error."""
+    try:
+        # CachedTokenAuthentication reads the shared token cache and the
+        # database, so it runs in a worker thread.
+        result = await sync_to_async(CachedTokenAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return None, exc.detail
+    if result is None:
+        return None, NotAuthenticated.default_detail
+    return result[0], None
+
+
+def render(data, status=200):
+    """Return data rendered as a JSON response."""
+    return HttpResponse(
+        TimedJSONRenderer().render(data), status=status, content_type='application/json',
+    )
+
+
+async def prefetch(recipes, field_names):
+    """Prefetch the many-to-many fields of recipes, one query each."""
+    await sync_to_async(prefetch_related_objects)(recipes, *field_names)
+
+
+class AsyncAPIView(View):
+    """Token authenticated async view running on the user's shard."""
+    pagination_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authenticated like the DRF views, so CSRF does not apply.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        user, error = await authenticate(request)
+        if user is None:
+            response = render({'detail': error}, status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        request.user = user
+        writes = request.method not in SAFE_METHODS
+        try:
+            alias = await sync_to_async(start_write)(user.pk) if writes else db_for_user(user)
+            try:
+                with use_shard(alias):
+                    return await super().dispatch(request, *args, **kwargs)
+            finally:
+                if writes:
+                    await sync_to_async(end_write)(user.pk)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return render(detail, status=exc.status_code)
+        except ObjectDoesNotExist:
+            return render({'detail': 'Not found.'}, status=404)
+
+    def parse(self, request):
+        """Return the JSON body of request."""
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+    def _save(self, serializer, **kwargs):
+        """Validate and save serializer in a transaction and return its data."""
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(using=router.db_for_write(serializer.Meta.model)):
+            serializer.save(**kwargs)
+            return serializer.data
+
+    async def save(self, serializer, **kwargs):
+        """Run _save in a worker thread."""
+        return await sync_to_async(self._save)(serializer, **kwargs)
+
+    async def fetch(self, request, queryset):
+        """
+        Return the objects of queryset and None, or the page asked for by
+        page_size and its paginator.
+        """
+        paginator = self.pagination_class()
+        drf_request = Request(request)
+        if paginator.get_page_size(drf_request):
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request, self)
+            return page, paginator
+        return [obj async for obj in queryset.aiterator()], None
+
+    def render_list(self, data, paginator):
+        """Return a list response, paginated like the DRF views when paginator is set."""
+        if paginator is not None:
+            data = paginator.get_paginated_response(data).data
+        return render(data)
+
+
+class RecipeListView(AsyncAPIView):
+    """List and create recipes."""
+    pagination_class = RecipeCursorPagination
+    prefetch_fields = ['tags', 'ingredients']
+    list_deferred_fields = ['description', 'image']
+
+    async def get(self, request):
+        queryset = filter_recipes(Recipe.objects.all(), request.GET) \
+            .filter(user=request.user).order_by('-id').defer(*self.list_deferred_fields)
+        recipes, paginator = await self.fetch(request, queryset)
+        await prefetch(recipes, self.prefetch_fields)
+        return self.render_list(serializers.RecipeSerializer(recipes, many=True).data, paginator)
+
+    async def post(self, request):
+        serializer = serializers.RecipeDetailSerializer(
+            data=self.parse(request), context={'request': request},
+        )
+        return render(await self.save(serializer, user=request.user), status=201)
+
+
+class RecipeDetailView(AsyncAPIView):
+    """Retrieve and update one recipe."""
+    prefetch_fields = ['tags', 'ingredients']
+
+    async def get_object(self, request, pk):
+        return await Recipe.objects.filter(user=request.user).aget(pk=pk)
+
+    async def get(self, request, pk):
+        recipe = await self.get_object(request, pk)
+        await prefetch([recipe], self.prefetch_fields)
+        return render(serializers.RecipeDetailSerializer(recipe).data)
+
+    async def put(self, request, pk, partial=False):
+        recipe = await self.get_object(request, pk)
+        serializer = serializers.RecipeDetailSerializer(
+            recipe, data=self.parse(request), partial=partial, context={'request': request},
+        )
+        return render(await self.save(serializer))
+
+    async def patch(self, request, pk):
+        return await self.put(request, pk, partial=True)
+
+
+class RecipeAttrListView(AsyncAPIView):
+    """List the user's tags or ingredients."""
+    pagination_class = RecipeAttrCursorPagination
+    model = None
+    serializer_class = None
+    count_serializer_class = None
+
+    def get_ordering(self):
+        """Return the ordering asked for, as RecipeAttrCursorPagination expects."""
+        return attr_ordering(self.request.GET)
+
+    async def get(self, request):
+        queryset = filter_attrs(self.model.objects.all(), request.GET) \
+            .filter(user=request.user).order_by(*self.get_ordering())
+        serializer_class = self.serializer_class
+        if request.GET.get('with_counts') == '1':
+            serializer_class = self.count_serializer_class
+        objs, paginator = await self.fetch(request, queryset)
+        return self.render_list(serializer_class(objs, many=True).data, paginator)
+
+
+class RecipeAttrDetailView(AsyncAPIView):
+    """Update one of the user's tags or ingredients."""
+    model = None
+    serializer_class = None
+
+    async def put(self, request, pk, partial=False):
+        obj = await self.model.objects.filter(user=request.user).aget(pk=pk)
+        serializer = self.serializer_class(
+            obj, data=self.parse(request), partial=partial, context={'request': request},
+        )
+        return render(await self.save(serializer))
+
+    async def patch(self, request, pk):
+        return await self.put(request, pk, partial=True)
+
+
+tag_list = RecipeAttrListView.as_view(
+    model=Tag,
+    serializer_class=serializers.TagSerializer,
+    count_serializer_class=serializers.TagCountSerializer,
+)
+tag_detail = RecipeAttrDetailView.as_view(model=Tag, serializer_class=serializers.TagSerializer)
+ingredient_list = RecipeAttrListView.as_view(
+    model=Ingredient,
+    serializer_class=serializers.IngredientSerializer,
+    count_serializer_class=serializers.IngredientCountSerializer,
+)
+ingredient_detail = RecipeAttrDetailView.as_view(
+    model=Ingredient, serializer_class=serializers.IngredientSerializer,
+)
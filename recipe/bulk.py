@@ -0,0 +1,236 @@
+"""
+Batched create, update and delete of recipes.
+"""
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Q
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import response_cache
+from recipe.serializers import RecipeBulkOperationSerializer, RecipeDetailSerializer
+
+
+RELATIONS = (
+    ('tags', Tag),
+    ('ingredients', Ingredient),
+)
+
+
+def insert_recipes(recipes):
+    """
+    Insert recipes in bulk, setting their primary keys.
+
+    Databases that cannot report the ids of a multi-row insert, MySQL among
+    them, get ids assigned beforehand, see core.sharding.allocates_ids().
+    """
+    if not recipes:
+        return recipes
+    return Recipe.objects.using(router.db_for_write(Recipe)).bulk_create(recipes)
+
+
+def resolve_attrs(user, model, names):
+    """Return a name to object mapping for names, creating missing ones."""
+    names = list(dict.fromkeys(names))
+    return dict(zip(names, model.objects.get_or_create_many(user, names)))
+
+
+def link_attrs(field_name, links):
+    """Insert through rows for new (recipe_id, attr_id) pairs in one query."""
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    column = f'{field.related_model._meta.model_name}_id'
+    through.objects.bulk_create(
+        [through(recipe_id=recipe_id, **{column: attr_id}) for recipe_id, attr_id in links],
+    )
+    # Through-row bulk writes bypass the m2m_changed counter handlers.
+    field.related_model.objects.adjust_recipe_counts(
+        Counter(attr_id for _, attr_id in links)
+    )
+
+
+def unlink_attrs(field_name, links):
+    """Delete through rows for (recipe_id, attr_ids) pairs in one query."""
+    if not links:
+        return
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    column = f'{field.related_model._meta.model_name}_id'
+    condition = Q()
+    for recipe_id, attr_ids in links:
+        condition |= Q(recipe_id=recipe_id, **{f'{column}__in': attr_ids})
+    through.objects.filter(condition).delete()
+    field.related_model.objects.adjust_recipe_counts(
+        {attr_id: -count for attr_id, count in Counter(
+            attr_id for _, attr_ids in links for attr_id in attr_ids
+        ).items()}
+    )
+
+
+def create_recipes(user, records):
+    """Insert validated recipe records and their links with bulk queries."""
+    attrs = {
+        name: resolve_attrs(user, model, [
+            item['name'] for record in records for item in record.get(name, [])
+        ])
+        for name, model in RELATIONS
+    }
+    recipes = insert_recipes([
+        Recipe(user=user, **{
+            key: value for key, value in record.items() if key not in attrs
+        })
+        for record in records
+    ])
+    for name, _ in RELATIONS:
+        link_attrs(name, list(dict.fromkeys(
+            (recipe.pk, attrs[name][item['name']].pk)
+            for recipe, record in zip(recipes, records)
+            for item in record.get(name, [])
+        )))
+    response_cache.invalidate_user(user.pk)
+    return recipes
+
+
+class RecipeBulkOperations:
+    """Validate and apply a batch of recipe operations for one user."""
+    max_operations = 500
+
+    def __init__(self, user, data, context=None):
+        self.user = user
+        self.initial_data = data
+        self.context = context or {}
+        self.operations = []
+        self.results = []
+
+    def _validate_recipe(self, operation):
+        """Validate the recipe payload of a create or update operation."""
+        serializer = RecipeDetailSerializer(
+            operation.get('instance'),
+            data=operation['data'],
+            partial=operation['op'] == 'update',
+            context=self.context,
+        )
+        serializer.is_valid(raise_exception=True)
+        operation['data'] = dict(serializer.validated_data)
+
+    def is_valid(self):
+        """Validate every operation, collecting errors per item."""
+        data = self.initial_data
+        if not isinstance(data, list) or not 0 < len(data) <= self.max_operations:
+            self.results = [{
+                'status': 'error',
+                'errors': f'Expected a list of 1 to {self.max_operations} operations.',
+            }]
+            return False
+
+        operations, errors = [], []
+        for op in data:
+            serializer = RecipeBulkOperationSerializer(data=op)
+            valid = serializer.is_valid()
+            operations.append(dict(serializer.validated_data) if valid else None)
+            errors.append(None if valid else serializer.errors)
+
+        ids = [op['id'] for op in operations if op and op['op'] != 'create']
+        instances = Recipe.objects.filter(user=self.user, id__in=ids) \
+            .prefetch_related(*[name for name, _ in RELATIONS]) \
+            .in_bulk() if ids else {}
+        seen = set()
+        for index, (op, error) in enumerate(zip(operations, errors)):
+            if op and not error:
+                try:
+                    if op['op'] != 'create':
+                        if op['id'] in seen:
+                            raise ValidationError(
+                                {'id': 'Recipe appears in more than one operation.'}
+                            )
+                        seen.add(op['id'])
+                        op['instance'] = instances.get(op['id'])
+                        if op['instance'] is None:
+                            raise ValidationError({'id': 'Not found.'})
+                    if op['op'] != 'delete':
+                        self._validate_recipe(op)
+                except ValidationError as exc:
+                    error = exc.detail
+            self.operations.append(op)
+            self.results.append(
+                {'index': index, 'status': 'error', 'errors': error}
+                if error else {'index': index, 'status': 'valid'}
+            )
+
+        if any(result['status'] == 'error' for result in self.results):
+            for result in self.results:
+                if result['status'] == 'valid':
+                    result['status'] = 'skipped'
+            return False
+        return True
+
+    def save(self):
+        """Apply all validated operations in one transaction."""
+        creates = [op for op in self.operations if op['op'] == 'create']
+        updates = [op for op in self.operations if op['op'] == 'update']
+        deletes = [op for op in self.operations if op['op'] == 'delete']
+
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            attrs = {
+                name: resolve_attrs(self.user, model, [
+                    item['name']
+                    for op in creates + updates
+                    for item in op['data'].get(name, [])
+                ])
+                for name, model in RELATIONS
+            }
+
+            if deletes:
+                Recipe.objects.filter(
+                    user=self.user,
+                    id__in=[op['id'] for op in deletes],
+                ).delete()
+
+            for op in creates:
+                op['instance'] = Recipe(user=self.user, **{
+                    key: value for key, value in op['data'].items()
+                    if key not in attrs
+                })
+            insert_recipes([op['instance'] for op in creates])
+
+            changed_fields = set()
+            changed = []
+            for op in updates:
+                instance = op['instance']
+                fields = [
+                    key for key, value in op['data'].items()
+                    if key not in attrs and getattr(instance, key) != value
+                ]
+                for key in fields:
+                    setattr(instance, key, op['data'][key])
+                if fields:
+                    changed.append(instance)
+                    changed_fields.update(fields)
+            if changed:
+                Recipe.objects.bulk_update(changed, sorted(changed_fields))
+
+            for name, _ in RELATIONS:
+                added, removed = [], []
+                for op in creates + updates:
+                    if name not in op['data']:
+                        continue
+                    recipe = op['instance']
+                    wanted = {attrs[name][item['name']].pk for item in op['data'][name]}
+                    current = set()
+                    if op['op'] == 'update':
+                        current = {obj.pk for obj in getattr(recipe, name).all()}
+                    added.extend((recipe.pk, pk) for pk in wanted - current)
+                    if current - wanted:
+                        removed.append((recipe.pk, current - wanted))
+                unlink_attrs(name, removed)
+                link_attrs(name, added)
+
+            # Bulk inserts and through-row writes do not send model signals.
+            response_cache.invalidate_user(self.user.pk)
+
+        for op, result in zip(self.operations, self.results):
+            result['status'] = f"{op['op']}d"
+            result['id'] = op['instance'].pk if op['op'] == 'create' else op['id']
+        return self.results
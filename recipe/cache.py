@@ -0,0 +1,152 @@
+"""
+Per-user response cache for the recipe APIs.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.response import Response
+
+from core.db.routers import served_by_replica
+
+
+class ResponseCache:
+    """
+    Cache of serialized list responses, namespaced by a per-user generation.
+
+    Writes bump the user's generation so every cached response for that
+    user becomes unreachable at once. Responses read from a replica are
+    not stored, since the replica may not have the user's latest write. Concurrent misses on the same key
+    are collapsed: the first request takes a short lock and rebuilds the
+    value while the others poll for it instead of hitting the database.
+    """
+    prefix = 'recipe-api'
+
+    def __init__(self, alias='default', timeout=300, lock_timeout=10,
+                 wait_timeout=2, poll_interval=0.05):
+        self.alias = alias
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, user_id):
+        return f'{self.prefix}:gen:{user_id}'
+
+    def get_generation(self, user_id):
+        """Return the current cache generation for a user."""
+        key = self._generation_key(user_id)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Start from the clock so an evicted generation is never reused.
+            self.cache.add(key, time.time_ns(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def invalidate_user(self, user_id):
+        """Bump the user's generation now and again after commit."""
+        if not settings.RESPONSE_CACHE['ENABLED']:
+            return
+        self._bump(user_id)
+        transaction.on_commit(lambda: self._bump(user_id))
+
+    def _bump(self, user_id):
+        try:
+            self.cache.incr(self._generation_key(user_id))
+        except ValueError:
+            self.cache.add(self._generation_key(user_id), time.time_ns(), timeout=None)
+
+    def key_for(self, request, view_name):
+        """Return the cache key for a request to a view."""
+        params = sorted(
+            (name, sorted(values)) for name, values in request.query_params.lists()
+        )
+        digest = hashlib.md5(
+            repr((request.get_host(), params)).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        generation = self.get_generation(request.user.pk)
+        return f'{self.prefix}:{request.user.pk}:{generation}:{view_name}:{digest}'
+
+    def get_or_build(self, key, build, cacheable=None):
+        """
+        Return the cached value for key, building it at most once.
+
+        A built value is only stored if cacheable() is true after building.
+        """
+        value = self.cache.get(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+        self._count(hit=False)
+
+        lock_key = f'{key}:lock'
+        if self.cache.add(lock_key, 1, timeout=self.lock_timeout):
+            try:
+                value = build()
+                if cacheable is None or cacheable():
+                    self.cache.set(key, value, timeout=self.timeout)
+            finally:
+                self.cache.delete(lock_key)
+            return value
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+        return build()
+
+    def stats(self):
+        """Return hit and miss counters."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+def _build_response_cache():
+    options = getattr(settings, 'RESPONSE_CACHE', {})
+    return ResponseCache(
+        alias=options.get('ALIAS', 'default'),
+        timeout=options.get('TIMEOUT', 300),
+        lock_timeout=options.get('LOCK_TIMEOUT', 10),
+        wait_timeout=options.get('WAIT_TIMEOUT', 2),
+    )
+
+
+response_cache = _build_response_cache()
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user response cache."""
+
+    def list(self, request, *args, **kwargs):
+        """Return the cached list response, building it on a miss."""
+        if not settings.RESPONSE_CACHE['ENABLED']:
+            return super().list(request, *args, **kwargs)
+        view_name = f'{self.basename}-list'
+        key = response_cache.key_for(request, view_name)
+        data = response_cache.get_or_build(
+            key,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            cacheable=lambda: not served_by_replica(),
+        )
+        return Response(data)
@@ -0,0 +1,57 @@
+"""
+Streaming exports of recipes.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Echo:
+    """File-like object that hands back what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Yield recipes newest first, one keyset chunk at a time.
+
+    Each chunk is a separate LIMIT query seeking past the previous one, so
+    prefetches run once per chunk and memory stays flat even on drivers
+    that buffer a whole result set client side (mysqlclient).
+    """
+    queryset = queryset.order_by('-id')
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        chunk = list(queryset.filter(id__lt=chunk[-1].id)[:chunk_size])
+
+
+def ndjson_rows(recipes, serializer):
+    """Yield one JSON document per recipe."""
+    encoder = DjangoJSONEncoder()
+    for recipe in recipes:
+        yield encoder.encode(serializer.to_representation(recipe)) + '\n'
+
+
+def csv_rows(recipes, serializer):
+    """Yield a header and one CSV row per recipe, joining nested names."""
+    writer = csv.writer(Echo())
+    fields = list(serializer.fields)
+    yield writer.writerow(fields)
+    for recipe in recipes:
+        data = serializer.to_representation(recipe)
+        yield writer.writerow([
+            '|'.join(item['name'] for item in data[field])
+            if isinstance(data[field], list) else data[field]
+            for field in fields
+        ])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_rows, 'application/x-ndjson'),
+    'csv': (csv_rows, 'text/csv'),
+}
@@ -0,0 +1,71 @@
+"""
+Query parameter filters shared by the sync and async recipe views.
+"""
+from django.db.models import Count, Exists, OuterRef
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+ATTR_ORDERINGS = {
+    'name': ('name',),
+    '-name': ('-name',),
+    'recipe_count': ('recipe_count', 'id'),
+    '-recipe_count': ('-recipe_count', '-id'),
+}
+
+
+def params_to_ints(qs, param):
+    """Convert a list of strings to integers."""
+    try:
+        return [int(str_id) for str_id in qs.split(',')]
+    except ValueError:
+        raise ValidationError({param: 'Expected a comma separated list of IDs.'})
+
+
+def filter_related(queryset, field_name, ids, match_all):
+    """Filter recipes linked to any or all ids without joining."""
+    field = Recipe._meta.get_field(field_name)
+    column = f'{field.related_model._meta.model_name}_id'
+    links = field.remote_field.through.objects.filter(**{f'{column}__in': ids})
+    if match_all:
+        matching = links.values('recipe_id').annotate(
+            matched=Count(column),
+        ).filter(matched=len(set(ids))).values('recipe_id')
+        return queryset.filter(pk__in=matching)
+    return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
+
+
+def filter_recipes(queryset, params):
+    """Apply the tags, ingredients and match parameters to recipes."""
+    tags = params.get('tags')
+    ingredients = params.get('ingredients')
+    match = params.get('match', 'any')
+    if match not in ('any', 'all'):
+        raise ValidationError({'match': 'Expected "any" or "all".'})
+    if tags:
+        tag_ids = params_to_ints(tags, 'tags')
+        queryset = filter_related(queryset, 'tags', tag_ids, match == 'all')
+    if ingredients:
+        ingredient_ids = params_to_ints(ingredients, 'ingredients')
+        queryset = filter_related(queryset, 'ingredients', ingredient_ids, match == 'all')
+    return queryset
+
+
+def attr_ordering(params):
+    """Return the tag or ingredient ordering requested with the ordering parameter."""
+    ordering = params.get('ordering', '-name')
+    if ordering not in ATTR_ORDERINGS:
+        raise ValidationError({'ordering': f'Expected one of {", ".join(ATTR_ORDERINGS)}.'})
+    return ATTR_ORDERINGS[ordering]
+
+
+def filter_attrs(queryset, params):
+    """Apply the assigned_only parameter to tags or ingredients."""
+    assigned_only = params.get('assigned_only', '0')
+    if assigned_only not in ('0', '1'):
+        raise ValidationError({'assigned_only': 'Expected 0 or 1.'})
+    if assigned_only == '1':
+        queryset = queryset.filter(recipe_count__gt=0)
+    return queryset
@@ -0,0 +1,122 @@
+"""
+Pagination for the recipe APIs.
+"""
+import json
+import operator
+from functools import reduce
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination enabled by the `page_size` query parameter.
+
+    Pages are located by seeking past the last key of the previous page,
+    so neither OFFSET nor COUNT(*) is issued and deep pages cost the same
+    as the first one. Requests without `page_size` keep the unpaginated
+    response.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeCursorPagination(KeysetPagination):
+    """Keyset pagination for recipes, newest first."""
+    ordering = '-id'
+
+
+class RecipeAttrCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for tags and ingredients, in the view's ordering.
+
+    Names are unique per user, so name orderings seek on the name alone.
+    Recipe counts repeat, so count orderings end with the id and their
+    cursors hold both values, seeking past the (recipe_count, id) pair
+    instead of skipping rows that share a count by offset.
+    """
+    ordering = '-name'
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering selected by the view."""
+        return view.get_ordering()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate like CursorPagination, seeking on every ordering field."""
+        if len(self.get_ordering(request, queryset, view)) == 1:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[self._flip(order) for order in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._seek(current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @staticmethod
+    def _flip(order):
+        return order[1:] if order.startswith('-') else f'-{order}'
+
+    def _seek(self, position, reverse):
+        """Return a filter for the rows after position in the ordering."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        conditions = []
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            conditions.append(equal & Q(**{f'{field}__{lookup}': value}))
+            equal &= Q(**{field: value})
+        return reduce(operator.or_, conditions)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            return json.dumps([instance[field] for field in fields])
+        return json.dumps([getattr(instance, field) for field in fields])
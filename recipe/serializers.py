@@ -4,27 +4,62 @@ Serializers for recipe APIs
 from rest_framework import serializers
 
 from core.models import Recipe, Tag, Ingredient
+from core.timing import TimedSerializerMixin, TimedListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class RecipeAttrSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Base serializer for recipe attributes."""
+
+    def validate_name(self, value):
+        """Reject renaming to a name the user already has."""
+        if self.instance is None or self.parent is not None:
+            return value
+        duplicate = type(self.instance).objects.filter(
+            user=self.instance.user_id,
+            name=value,
+        ).exclude(pk=self.instance.pk)
+        if duplicate.exists():
+            raise serializers.ValidationError(f'"{value}" already exists.')
+        return value
+
+
+class IngredientSerializer(RecipeAttrSerializer):
     """Serializer for ingredients."""
 
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(RecipeAttrSerializer):
     """Serializer for tags."""
 
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredients with their recipe count."""
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = IngredientSerializer.Meta.read_only_fields + ['recipe_count']
+
+
+class TagCountSerializer(TagSerializer):
+    """Serializer for tags with their recipe count."""
 
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = TagSerializer.Meta.read_only_fields + ['recipe_count']
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -36,34 +71,40 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
         ]
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
-    def _get_or_create_tags(self, tags, recipe):
+    def _get_or_create_tags(self, tags):
         """Handle getting or creating tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        return Tag.objects.get_or_create_many(
+            auth_user,
+            [tag['name'] for tag in tags],
+        )
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
+    def _get_or_create_ingredients(self, ingredients):
         """Handle getting or creating ingredients as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return Ingredient.objects.get_or_create_many(
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        )
+
+    def _sync_related(self, manager, objs):
+        """Write only the through rows that differ from the current set."""
+        current = {obj.pk for obj in manager.all()}
+        wanted = {obj.pk for obj in objs}
+        if current - wanted:
+            manager.remove(*(current - wanted))
+        if wanted - current:
+            manager.add(*(wanted - current))
 
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe.tags.add(*self._get_or_create_tags(tags))
+        recipe.ingredients.add(*self._get_or_create_ingredients(ingredients))
 
         return recipe
 
@@ -72,16 +113,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._sync_related(instance.tags, self._get_or_create_tags(tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            self._sync_related(
+                instance.ingredients,
+                self._get_or_create_ingredients(ingredients),
+            )
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed:
+            setattr(instance, attr, validated_data[attr])
 
-        instance.save()
+        if changed:
+            instance.save(update_fields=changed)
         return instance
 
 
@@ -92,7 +139,7 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description']
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
 
     class Meta:
@@ -100,3 +147,16 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+
+class RecipeBulkOperationSerializer(serializers.Serializer):
+    """Serializer for one operation of a bulk recipe request."""
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(default=dict)
+
+    def validate(self, attrs):
+        """Require the recipe id for updates and deletes."""
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'This field is required.'})
+        return attrs
@@ -0,0 +1,27 @@
+"""
+Signal handlers that invalidate cached recipe API responses.
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import response_cache
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """Invalidate the owner's cached responses after a write."""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        response_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user_responses(sender, instance, created, **kwargs):
+    """Make sure a recycled user id never sees another account's entries."""
+    if created:
+        response_cache.invalidate_user(instance.pk)
@@ -0,0 +1,190 @@
+"""
+Tests for the async recipe APIs.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.models import Recipe, Tag, Ingredient
+from recipe import serializers
+
+
+RECIPES_URL = reverse('recipe-async:recipe-list')
+TAGS_URL = reverse('recipe-async:tag-list')
+
+
+def detail_url(name, pk):
+    """Create and return an async detail url."""
+    return reverse(f'recipe-async:{name}-detail', args=[pk])
+
+
+class AsyncRecipeApiTests(TestCase):
+    """Test the async recipe, tag and ingredient endpoints."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        self.token = Token.objects.create(user=self.user)
+        token_cache.clear()
+        self.client = AsyncClient()
+        self.auth = {'AUTHORIZATION': f'Token {self.token.key}'}
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=Decimal('2.50'),
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Hot')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Leek'))
+
+    async def test_auth_required(self):
+        """Test requests without a token are rejected."""
+        res = await self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_list(self):
+        """Test listing the user's recipes with one query per relation."""
+        other = await get_user_model().objects.acreate(email='other@example.com')
+        await Recipe.objects.acreate(user=other, title='Other', time_minutes=1, price=Decimal('1'))
+
+        res = await self.client.get(RECIPES_URL, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = json.loads(res.content)
+        self.assertEqual([item['id'] for item in data], [self.recipe.pk])
+        self.assertEqual(data[0]['tags'], [{'id': self.tag.pk, 'name': 'Hot'}])
+        self.assertEqual(data[0]['ingredients'][0]['name'], 'Leek')
+        self.assertRegex(res['Server-Timing'], r'db;dur=[\d.]+;desc="4 queries"')
+
+    async def test_list_paginated(self):
+        """Test page_size pages the list with cursors like the DRF API."""
+        newer = await Recipe.objects.acreate(
+            user=self.user, title='Pie', time_minutes=5, price=Decimal('1.00'),
+        )
+
+        res = await self.client.get(RECIPES_URL, {'page_size': 1}, **self.auth)
+
+        data = json.loads(res.content)
+        self.assertEqual([item['id'] for item in data['results']], [newer.pk])
+        self.assertEqual(data['results'][0]['tags'], [])
+        res = await self.client.get(data['next'], **self.auth)
+
+        data = json.loads(res.content)
+        self.assertEqual([item['id'] for item in data['results']], [self.recipe.pk])
+        self.assertIsNone(data['next'])
+
+    async def test_invalid_token(self):
+        """Test an unknown token is rejected with the DRF message."""
+        res = await self.client.get(RECIPES_URL, AUTHORIZATION='Token missing')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(res.content), {'detail': 'Invalid token.'})
+
+    async def test_retrieve(self):
+        """Test retrieving one recipe with its description."""
+        res = await self.client.get(detail_url('recipe', self.recipe.pk), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content)['description'], '')
+
+    async def test_retrieve_other_users_recipe(self):
+        """Test another user's recipe is not found."""
+        other = await get_user_model().objects.acreate(email='other@example.com')
+        recipe = await Recipe.objects.acreate(user=other, title='Other', time_minutes=1, price=Decimal('1'))
+
+        res = await self.client.get(detail_url('recipe', recipe.pk), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create(self):
+        """Test creating a recipe with new and existing tags."""
+        payload = {
+            'title': 'Pie', 'time_minutes': 30, 'price': '5.00',
+            'tags': [{'name': 'Hot'}, {'name': 'Sweet'}],
+        }
+        res = await self.client.post(RECIPES_URL, payload, content_type='application/json', **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = await Recipe.objects.aget(pk=json.loads(res.content)['id'])
+        self.assertEqual(
+            sorted([tag.name async for tag in Tag.objects.filter(recipe=recipe)]), ['Hot', 'Sweet'],
+        )
+        self.assertEqual((await Tag.objects.aget(pk=self.tag.pk)).recipe_count, 2)
+
+    async def test_create_invalid(self):
+        """Test validation errors are returned like the DRF API."""
+        res = await self.client.post(
+            RECIPES_URL, {'title': 'Pie'}, content_type='application/json', **self.auth,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time_minutes', json.loads(res.content))
+
+    async def test_partial_update(self):
+        """Test patching a recipe."""
+        res = await self.client.patch(
+            detail_url('recipe', self.recipe.pk), {'title': 'Stew', 'tags': []},
+            content_type='application/json', **self.auth,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe = await Recipe.objects.aget(pk=self.recipe.pk)
+        self.assertEqual(recipe.title, 'Stew')
+        self.assertFalse(await Tag.objects.filter(recipe=recipe).aexists())
+
+    async def test_list_tags_with_counts(self):
+        """Test listing tags with their recipe counts."""
+        res = await self.client.get(TAGS_URL, {'with_counts': '1'}, **self.auth)
+
+        self.assertEqual(json.loads(res.content), [{'id': self.tag.pk, 'name': 'Hot', 'recipe_count': 1}])
+
+    async def test_list_tags_paginated_by_count(self):
+        """Test tags ordered by count are paged on the count and id."""
+        cold = await Tag.objects.acreate(user=self.user, name='Cold')
+
+        res = await self.client.get(
+            TAGS_URL, {'ordering': '-recipe_count', 'page_size': 1}, **self.auth,
+        )
+        first = json.loads(res.content)
+        res = await self.client.get(first['next'], **self.auth)
+        second = json.loads(res.content)
+
+        self.assertEqual(
+            [item['id'] for item in first['results'] + second['results']], [self.tag.pk, cold.pk],
+        )
+        self.assertIsNone(second['next'])
+
+    async def test_invalid_ordering(self):
+        """Test an unknown ordering is rejected."""
+        res = await self.client.get(TAGS_URL, {'ordering': 'id'}, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to another tag's name fails."""
+        other = await Tag.objects.acreate(user=self.user, name='Cold')
+
+        res = await self.client.put(
+            detail_url('tag', other.pk), {'name': 'Hot'}, content_type='application/json', **self.auth,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_update_ingredient(self):
+        """Test renaming an ingredient."""
+        ingredient = await Ingredient.objects.aget(user=self.user)
+
+        res = await self.client.patch(
+            detail_url('ingredient', ingredient.pk), {'name': 'Onion'},
+            content_type='application/json', **self.auth,
+        )
+
+        self.assertEqual(json.loads(res.content), serializers.IngredientSerializer(
+            await Ingredient.objects.aget(pk=ingredient.pk)
+        ).data)
@@ -0,0 +1,182 @@
+"""
+Tests for the recipe API response cache.
+"""
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+from core.checks import check_response_cache
+from recipe.cache import response_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+RESPONSE_CACHE = {**settings.RESPONSE_CACHE, 'ENABLED': True}
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RESPONSE_CACHE=RESPONSE_CACHE)
+class ResponseCacheApiTests(TestCase):
+    """Test cached list responses."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        """Test a repeated list request does not query the database."""
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+
+    def test_query_parameters_normalized(self):
+        """Test parameter order does not change the cache key."""
+        self.client.get(TAGS_URL, {'assigned_only': 0, 'page_size': 5})
+
+        with self.assertNumQueries(0):
+            self.client.get(f'{TAGS_URL}?page_size=5&assigned_only=0')
+
+    def test_replica_responses_not_stored(self):
+        """Test lists read from a replica are rebuilt on the next request."""
+        with patch('recipe.cache.served_by_replica', return_value=True):
+            self.client.get(RECIPES_URL)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_api_write_invalidates_list(self):
+        """Test creating a recipe through the API invalidates the list."""
+        self.client.get(RECIPES_URL)
+        payload = {'title': 'New', 'time_minutes': 5, 'price': '1.00'}
+        self.client.post(RECIPES_URL, payload)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_bulk_write_invalidates_list(self):
+        """Test bulk inserts, which send no signals, invalidate the list."""
+        self.client.get(RECIPES_URL)
+        payload = [{'op': 'create', 'data': {
+            'title': 'New', 'time_minutes': 5, 'price': '1.00',
+        }}]
+        self.client.post(reverse('recipe:recipe-bulk'), payload, format='json')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_m2m_change_invalidates_list(self):
+        """Test adding a tag to a recipe invalidates the cached lists."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Vegan')
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 1)
+
+    def test_cache_scoped_to_user(self):
+        """Test one user's cached list is not served to another."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data, [])
+
+
+@override_settings(RESPONSE_CACHE=RESPONSE_CACHE)
+class ResponseCacheTests(TestCase):
+    """Test the response cache building values once."""
+
+    def test_concurrent_miss_waits_for_builder(self):
+        """Test a miss while another request rebuilds waits for its value."""
+        key = 'recipe-api:test:waiter'
+        response_cache.cache.delete(key)
+        response_cache.cache.add(f'{key}:lock', 1)
+        self.addCleanup(response_cache.cache.delete, f'{key}:lock')
+        build = Mock(return_value=['fresh'])
+
+        def finish_build(seconds):
+            response_cache.cache.set(key, ['built elsewhere'])
+
+        with patch('recipe.cache.time.sleep', side_effect=finish_build):
+            value = response_cache.get_or_build(key, build)
+
+        self.assertEqual(value, ['built elsewhere'])
+        build.assert_not_called()
+
+    def test_miss_builds_and_stores(self):
+        """Test the first miss builds the value and caches it."""
+        key = 'recipe-api:test:builder'
+        response_cache.cache.delete(key)
+        build = Mock(return_value=['fresh'])
+
+        response_cache.get_or_build(key, build)
+        value = response_cache.get_or_build(key, build)
+
+        self.assertEqual(value, ['fresh'])
+        build.assert_called_once()
+        self.assertIsNone(response_cache.cache.get(f'{key}:lock'))
+
+    def test_disabled_by_default(self):
+        """Test lists are rebuilt on every request unless the cache is enabled."""
+        with override_settings(RESPONSE_CACHE={**RESPONSE_CACHE, 'ENABLED': False}):
+            client = APIClient()
+            client.force_authenticate(get_user_model().objects.create_user('u@example.com', 'pass123'))
+            client.get(RECIPES_URL)
+
+            with self.assertNumQueries(1):
+                client.get(RECIPES_URL)
+
+    def test_check_requires_shared_cache(self):
+        """Test enabling the cache with a per-process cache is a configuration error."""
+        errors = check_response_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E004'])
+        with override_settings(RESPONSE_CACHE={**RESPONSE_CACHE, 'ENABLED': False}):
+            self.assertEqual(check_response_cache(None), [])
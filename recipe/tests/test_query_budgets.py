@@ -0,0 +1,212 @@
+"""
+Query budgets for the recipe, tag and ingredient APIs.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.testing import QueryBudgetMixin, without_bulk_insert_ids
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(name, obj_id):
+    """Create and return a detail URL for a router basename."""
+    return reverse(f'recipe:{name}-detail', args=[obj_id])
+
+
+class RecipeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the recipe endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipe(self, links=2):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Recipe', time_minutes=5, price=Decimal('1.00'),
+        )
+        for model, manager in ((Tag, recipe.tags), (Ingredient, recipe.ingredients)):
+            manager.add(*model.objects.get_or_create_many(
+                self.user, [f'{model.__name__} {i}' for i in range(links)],
+            ))
+        return recipe
+
+    def _populate_recipes(self, size):
+        for _ in range(size - Recipe.objects.filter(user=self.user).count()):
+            self._create_recipe()
+
+    def _populate_links(self, size):
+        """Give a fresh recipe size tags and ingredients."""
+        self.recipe = self._create_recipe(links=size)
+
+    def _payload(self, size):
+        return {
+            'title': 'New recipe',
+            'time_minutes': 10,
+            'price': '2.50',
+            'tags': [{'name': f'Tag {i}'} for i in range(size)],
+            'ingredients': [{'name': f'Ingredient {i}'} for i in range(size)],
+        }
+
+    def test_list(self):
+        """Test listing recipes."""
+        self.assertQueryBudget(
+            3, lambda: self.client.get(RECIPES_URL), self._populate_recipes,
+        )
+
+    def test_list_filtered(self):
+        """Test listing recipes filtered by tag."""
+        tag = Tag.objects.get_or_create_many(self.user, ['Tag 0'])[0]
+        self.assertQueryBudget(
+            3,
+            lambda: self.client.get(RECIPES_URL, {'tags': str(tag.id), 'match': 'all'}),
+            self._populate_recipes,
+        )
+
+    def test_list_paginated(self):
+        """Test listing a page of recipes."""
+        self.assertQueryBudget(
+            3,
+            lambda: self.client.get(RECIPES_URL, {'page_size': 5}),
+            self._populate_recipes,
+        )
+
+    def test_export(self):
+        """Test exporting recipes."""
+        def export():
+            response = self.client.get(EXPORT_URL)
+            b''.join(response.streaming_content)
+            return response
+
+        self.assertQueryBudget(3, export, self._populate_recipes)
+
+    def test_retrieve(self):
+        """Test retrieving a recipe with many tags and ingredients."""
+        self.assertQueryBudget(
+            3,
+            lambda: self.client.get(detail_url('recipe', self.recipe.id)),
+            self._populate_links,
+        )
+
+    def test_create(self):
+        """Test creating a recipe with many tags and ingredients."""
+        self.assertQueryBudget(
+            15,
+            lambda: self.client.post(RECIPES_URL, self.payload, format='json'),
+            lambda size: setattr(self, 'payload', self._payload(size)),
+        )
+
+    def test_partial_update(self):
+        """Test replacing the tags and ingredients of a recipe."""
+        def populate(size):
+            self.recipe = self._create_recipe(links=0)
+            self.recipe.tags.add(Tag.objects.create(user=self.user, name=f'Old {size}'))
+            self.payload = self._payload(size)
+
+        self.assertQueryBudget(
+            20,
+            lambda: self.client.patch(
+                detail_url('recipe', self.recipe.id), self.payload, format='json',
+            ),
+            populate,
+        )
+
+    def test_delete(self):
+        """Test deleting a recipe with many tags and ingredients."""
+        self.assertQueryBudget(
+            6,
+            lambda: self.client.delete(detail_url('recipe', self.recipe.id)),
+            self._populate_links,
+        )
+
+    def _assert_bulk_budget(self):
+        self._create_recipe(links=2)
+
+        def populate(size):
+            self.payload = [
+                {'op': 'create', 'data': self._payload(2)} for _ in range(size)
+            ]
+
+        self.assertQueryBudget(
+            9,
+            lambda: self.client.post(BULK_URL, self.payload, format='json'),
+            populate,
+        )
+
+    def test_bulk(self):
+        """Test creating many recipes in one bulk request."""
+        self._assert_bulk_budget()
+
+    def test_bulk_without_returned_ids(self):
+        """Test the bulk budget holds on databases returning no ids, like MySQL."""
+        sharding_settings = {**settings.SHARDING, 'ID_BLOCK_SIZE': 1000}
+        with without_bulk_insert_ids(), override_settings(SHARDING=sharding_settings):
+            # Ids are reserved a block at a time, take the first one up front.
+            sharding.allocate_ids(Recipe, 1)
+            self._assert_bulk_budget()
+
+
+class RecipeAttrQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the tag and ingredient endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Recipe', time_minutes=5, price=Decimal('1.00'),
+        )
+
+    def _populate(self, model, manager):
+        self.extra = 0
+
+        def populate(size):
+            existing = model.objects.filter(user=self.user).count()
+            objs = model.objects.get_or_create_many(
+                self.user, [f'{model.__name__} {i}' for i in range(existing, size)],
+            )
+            manager.add(*objs)
+            self.extra += 1
+            self.obj = model.objects.create(user=self.user, name=f'Extra {self.extra}')
+        return populate
+
+    def _check_endpoints(self, model, name, url, manager):
+        populate = self._populate(model, manager)
+        budgets = [
+            (1, lambda: self.client.get(url)),
+            (1, lambda: self.client.get(url, {'assigned_only': 1, 'with_counts': 1})),
+            (1, lambda: self.client.get(url, {'ordering': '-recipe_count', 'page_size': 5})),
+            (3, lambda: self.client.patch(
+                detail_url(name, self.obj.id), {'name': f'Renamed {self.obj.id}'},
+            )),
+            (3, lambda: self.client.delete(detail_url(name, self.obj.id))),
+        ]
+        for budget, make_request in budgets:
+            with self.subTest(budget=budget):
+                self.assertQueryBudget(budget, make_request, populate)
+
+    def test_tag_endpoints(self):
+        """Test the tag list, update and delete endpoints."""
+        self._check_endpoints(Tag, 'tag', TAGS_URL, self.recipe.tags)
+
+    def test_ingredient_endpoints(self):
+        """Test the ingredient list, update and delete endpoints."""
+        self._check_endpoints(Ingredient, 'ingredient', INGREDIENTS_URL, self.recipe.ingredients)
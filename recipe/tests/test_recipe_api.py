@@ -2,13 +2,20 @@
 Tests for recipe APIs.
 """
 from decimal import Decimal
+from unittest.mock import patch
+import csv
+import io
+import json
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import m2m_changed
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -27,6 +34,7 @@ from recipe.serializers import (
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(recipe_id):
@@ -253,6 +261,27 @@ class PrivateRecipeApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipe_with_many_tags_constant_queries(self):
+        """Test tags and ingredients are resolved with set based queries."""
+        Tag.objects.create(user=self.user, name='Tag 0')
+        payload = {
+            'title': 'Big Salad',
+            'time_minutes': 15,
+            'price': Decimal('8.00'),
+            'tags': [{'name': f'Tag {i}'} for i in range(30)],
+            'ingredients': [{'name': f'Ingredient {i}'} for i in range(30)],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(len(ctx.captured_queries), 15)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+
     def test_create_tag_on_update(self):
         """Test create tag when updating a recipe."""
         recipe = create_recipe(user=self.user)
@@ -280,6 +309,45 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_breakfast, recipe.tags.all())
 
+    def test_update_recipe_tags_writes_only_changes(self):
+        """Test updating tags only adds and removes the changed rows."""
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe.tags.add(keep, drop)
+        events = []
+
+        def record(sender, action, pk_set, **kwargs):
+            events.append((action, pk_set))
+
+        m2m_changed.connect(record, sender=Recipe.tags.through)
+        self.addCleanup(m2m_changed.disconnect, record, sender=Recipe.tags.through)
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        new = Tag.objects.get(user=self.user, name='New')
+        self.assertEqual(set(recipe.tags.all()), {keep, new})
+        self.assertIn(('post_remove', {drop.id}), events)
+        self.assertIn(('post_add', {new.id}), events)
+        self.assertNotIn('post_clear', [action for action, _ in events])
+
+    def test_partial_update_saves_changed_fields_only(self):
+        """Test a partial update only writes the modified columns."""
+        recipe = create_recipe(user=self.user, title='Old title')
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(detail_url(recipe.id), {'title': 'New title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('title', updates[0])
+        self.assertNotIn('description', updates[0])
+
     def test_clear_recipe_tags(self):
         """Test clearing a recipes tags."""
         tag = Tag.objects.create(user=self.user, name='Dessert')
@@ -419,6 +487,163 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_list_recipes_query_count_is_constant(self):
+        """Test listing recipes does not issue queries per recipe."""
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ingredient {i}')
+            )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+    def test_get_recipe_detail_prefetches_relations(self):
+        """Test recipe detail loads tags and ingredients in bulk."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+    def test_filter_by_all_tags(self):
+        """Test match=all only returns recipes having every tag."""
+        r1 = create_recipe(user=self.user, title='Vegan Curry')
+        r2 = create_recipe(user=self.user, title='Vegan Salad')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual([item['id'] for item in res.data], [r1.id])
+
+    def test_filter_by_tags_without_distinct(self):
+        """Test tag filters return each recipe once without DISTINCT."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tags.add(tag1, tag2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(len(res.data), 1)
+        self.assertNotIn('DISTINCT', ctx.captured_queries[0]['sql'])
+
+    def test_filter_invalid_ids_returns_error(self):
+        """Test non-numeric filter IDs return a bad request."""
+        res = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_filter_invalid_match_returns_error(self):
+        """Test an unknown match mode returns a bad request."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_recipes_paginated(self):
+        """Test paging through recipes with a cursor."""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipes[2].id, recipes[1].id])
+        self.assertIsNone(res.data['previous'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(res.data['next'])
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipes[0].id])
+        self.assertIsNone(res.data['next'])
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_paginated_list_applies_filters(self):
+        """Test cursor pagination respects the tag filter."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        r1 = create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        r3 = create_recipe(user=self.user)
+        r1.tags.add(tag)
+        r3.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {'tags': tag.id, 'page_size': 1})
+        self.assertEqual(res.data['results'][0]['id'], r3.id)
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.data['results'][0]['id'], r1.id)
+        self.assertIsNone(res.data['next'])
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON."""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        r2.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        create_recipe(user=create_user(email='other@example.com', password='test123'))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], [r2.id, r1.id])
+        self.assertEqual(rows[0]['tags'][0]['name'], 'Vegan')
+        self.assertEqual(rows[1]['description'], r1.description)
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV."""
+        recipe = create_recipe(user=self.user, title='Curry, hot')
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'),
+            Ingredient.objects.create(user=self.user, name='Chili'),
+        )
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry, hot')
+        self.assertEqual(sorted(rows[0]['ingredients'].split('|')), ['Chili', 'Rice'])
+
+    @patch('recipe.views.RecipeViewSet.export_chunk_size', 2)
+    def test_export_queries_per_chunk(self):
+        """Test the export prefetches relations once per chunk."""
+        for i in range(5):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Tag {i}'))
+
+        res = self.client.get(EXPORT_URL)
+
+        with self.assertNumQueries(9):
+            lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_export_invalid_format(self):
+        """Test an unknown export format returns a bad request."""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -0,0 +1,182 @@
+"""
+Tests for the bulk recipe API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from core.testing import without_bulk_insert_ids
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicRecipeBulkApiTests(TestCase):
+    """Test unauthenticated bulk API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to call the bulk API."""
+        res = APIClient().post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkApiTests(TestCase):
+    """Test authenticated bulk API requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_update_delete(self):
+        """Test applying mixed operations in one request."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        to_update = create_recipe(user=self.user, title='Old title')
+        to_update.tags.add(tag)
+        to_delete = create_recipe(user=self.user)
+        payload = [
+            {'op': 'create', 'data': {
+                'title': 'Curry',
+                'time_minutes': 30,
+                'price': '4.50',
+                'tags': [{'name': 'Dinner'}, {'name': 'Thai'}],
+                'ingredients': [{'name': 'Rice'}],
+            }},
+            {'op': 'update', 'id': to_update.id, 'data': {
+                'title': 'New title',
+                'tags': [{'name': 'Thai'}],
+            }},
+            {'op': 'delete', 'id': to_delete.id},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        statuses = [result['status'] for result in res.data]
+        self.assertEqual(statuses, ['created', 'updated', 'deleted'])
+        created = Recipe.objects.get(id=res.data[0]['id'])
+        self.assertEqual(created.user, self.user)
+        self.assertEqual(
+            sorted(created.tags.values_list('name', flat=True)),
+            ['Dinner', 'Thai'],
+        )
+        self.assertEqual(created.ingredients.get().name, 'Rice')
+        to_update.refresh_from_db()
+        self.assertEqual(to_update.title, 'New title')
+        self.assertEqual(list(to_update.tags.values_list('name', flat=True)), ['Thai'])
+        self.assertFalse(Recipe.objects.filter(id=to_delete.id).exists())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        counts = dict(Tag.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'Dinner': 1, 'Thai': 2})
+
+    def test_bulk_invalid_item_rejects_batch(self):
+        """Test one invalid operation reports errors and writes nothing."""
+        payload = [
+            {'op': 'create', 'data': {
+                'title': 'Valid', 'time_minutes': 5, 'price': '1.00',
+            }},
+            {'op': 'create', 'data': {'title': 'Missing fields'}},
+            {'op': 'delete'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        statuses = [result['status'] for result in res.data]
+        self.assertEqual(statuses, ['skipped', 'error', 'error'])
+        self.assertIn('time_minutes', res.data[1]['errors'])
+        self.assertIn('id', res.data[2]['errors'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_other_users_recipe_not_found(self):
+        """Test operations cannot touch another user's recipes."""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        recipe = create_recipe(user=other)
+
+        res = self.client.post(
+            BULK_URL,
+            [{'op': 'delete', 'id': recipe.id}],
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_create_query_count_constant(self):
+        """Test a batch of creates does not issue queries per recipe."""
+        payload = [
+            {'op': 'create', 'data': {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '2.00',
+                'tags': [{'name': f'Tag {i}'}, {'name': 'Shared'}],
+            }}
+            for i in range(20)
+        ]
+
+        with self.assertNumQueries(9):
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 21)
+
+    def test_bulk_create_without_returned_ids(self):
+        """Test recipes are inserted at once when the database returns no ids."""
+        payload = [
+            {'op': 'create', 'data': {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '2.00',
+            }}
+            for i in range(20)
+        ]
+
+        with without_bulk_insert_ids(), CaptureQueriesContext(connection) as captured:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        table = Recipe._meta.db_table
+        inserts = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith(f'INSERT INTO "{table}"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        ids = [result['id'] for result in res.data]
+        self.assertEqual(len(set(ids)), 20)
+        self.assertEqual(Recipe.objects.filter(user=self.user, id__in=ids).count(), 20)
+
+    def test_bulk_requires_list(self):
+        """Test the bulk API rejects a non-list payload."""
+        res = self.client.post(BULK_URL, {'op': 'create'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
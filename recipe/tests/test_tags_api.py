@@ -89,6 +89,17 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -141,3 +152,71 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_list_tags_paginated(self):
+        """Test paging through tags by name."""
+        for name in ['Breakfast', 'Lunch', 'Dinner']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [item['name'] for item in res.data['results']]
+        self.assertEqual(names, ['Lunch', 'Dinner'])
+        res = self.client.get(res.data['next'])
+        names = [item['name'] for item in res.data['results']]
+        self.assertEqual(names, ['Breakfast'])
+        self.assertIsNone(res.data['next'])
+
+    def test_list_tags_with_counts_ordered(self):
+        """Test listing tags with recipe counts, most used first."""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ['Pancakes', 'Porridge']:
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=Decimal('5.00'),
+                user=self.user,
+            )
+            recipe.tags.add(tag1)
+        recipe.tags.add(tag2)
+
+        res = self.client.get(TAGS_URL, {'with_counts': 1, 'ordering': '-recipe_count'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['recipe_count']) for item in res.data],
+            [('Breakfast', 2), ('Lunch', 1)],
+        )
+
+    def test_list_tags_paginated_by_count(self):
+        """Test paging through tags sharing a count returns each tag once."""
+        Tag.objects.bulk_create(Tag(user=self.user, name=f'Tag {index}') for index in range(25))
+        tag = Tag.objects.create(user=self.user, name='Used')
+        recipe = Recipe.objects.create(
+            title='Pancakes', time_minutes=5, price=Decimal('5.00'), user=self.user,
+        )
+        recipe.tags.add(tag)
+
+        pages = []
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count', 'page_size': 4})
+        while True:
+            pages.append([item['id'] for item in res.data['results']])
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+        ids = [pk for page in pages for pk in page]
+
+        self.assertEqual(ids[0], tag.id)
+        self.assertEqual(len(ids), 26)
+        self.assertEqual(len(set(ids)), 26)
+        self.assertEqual(ids[1:], sorted(ids[1:], reverse=True))
+        res = self.client.get(res.data['previous'])
+        self.assertEqual([item['id'] for item in res.data['results']], pages[-2])
+
+    def test_list_tags_invalid_ordering(self):
+        """Test an unknown ordering returns a bad request."""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
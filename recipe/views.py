@@ -1,15 +1,25 @@
 """
 Views for the recipe APIs
 """
+from django.db import router
+from django.http import StreamingHttpResponse
+
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Recipe, Tag, Ingredient
+from core.sharding import ShardedViewMixin
 from recipe import serializers
+from recipe.bulk import RecipeBulkOperations
+from recipe.cache import CachedListMixin
+from recipe.export import EXPORT_FORMATS, iter_chunks
+from recipe.filters import attr_ordering, filter_attrs, filter_recipes
+from recipe.pagination import RecipeCursorPagination, RecipeAttrCursorPagination
 
 
 @extend_schema_view(
@@ -25,32 +35,37 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match recipes with any (default) or all of the listed IDs.',
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ShardedViewMixin, CachedListMixin, viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
-
-    def _params_to_ints(self, qs):
-        """Convert a list of strings to integers."""
-        return [int(str_id) for str_id in qs.split(',')]
+    pagination_class = RecipeCursorPagination
+    prefetch_fields = ['tags', 'ingredients']
+    list_deferred_fields = ['description', 'image']
+    export_chunk_size = 500
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+        queryset = filter_recipes(self.queryset, self.request.query_params)
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        if self.action == 'list':
+            queryset = queryset.defer(*self.list_deferred_fields)
+        if self.action != 'destroy':
+            fields = self.get_serializer_class().Meta.fields
+            queryset = queryset.prefetch_related(
+                *[name for name in self.prefetch_fields if name in fields]
+            )
+        return queryset
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
@@ -64,6 +79,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    @extend_schema(request=serializers.RecipeBulkOperationSerializer(many=True))
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create, update and delete recipes in one transaction."""
+        operations = RecipeBulkOperations(
+            request.user,
+            request.data,
+            context=self.get_serializer_context(),
+        )
+        if not operations.is_valid():
+            return Response(operations.results, status=status.HTTP_400_BAD_REQUEST)
+        return Response(operations.save(), status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=list(EXPORT_FORMATS),
+                description='Export format, ndjson (default) or csv.',
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all of the user's recipes as NDJSON or CSV."""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': f'Expected one of {", ".join(EXPORT_FORMATS)}.'})
+        rows, content_type = EXPORT_FORMATS[export_format]
+        # The rows are read after the response leaves the view, when the
+        # request's routing no longer applies, so pin the database now.
+        queryset = self.get_queryset().using(router.db_for_read(Recipe))
+        recipes = iter_chunks(queryset, self.export_chunk_size)
+        response = StreamingHttpResponse(
+            rows(recipes, self.get_serializer()),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="recipes.{export_format}"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
@@ -83,33 +139,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['name', '-name', 'recipe_count', '-recipe_count'],
+                description='Sort by name (default -name) or by recipe count.',
+            ),
+            OpenApiParameter(
+                'with_counts',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item.',
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ShardedViewMixin,
+                            CachedListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+
+    def get_ordering(self):
+        """Return the ordering requested with the ordering parameter."""
+        return attr_ordering(self.request.query_params)
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        assigned_only = bool(int(self.request.query_params.get('assigned_only', 0)))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        queryset = filter_attrs(self.queryset, self.request.query_params)
+        return queryset.filter(user=self.request.user).order_by(*self.get_ordering())
+
+    def get_serializer_class(self):
+        """Return the serializer class for request."""
+        if self.request.query_params.get('with_counts') == '1':
+            return self.count_serializer_class
+        return self.serializer_class
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database."""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
@@ -0,0 +1,74 @@
+"""
+Query budgets for the user API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.testing import QueryBudgetMixin
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the user endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123', name='Test Name',
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _populate(self, size):
+        """Grow the number of users and of recipes owned by the user."""
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(email=f'other{index}@example.com', name='Other')
+            for index in range(User.objects.count(), size + 1)
+        )
+        for _ in range(size - Recipe.objects.filter(user=self.user).count()):
+            Recipe.objects.create(
+                user=self.user, title='Recipe', time_minutes=5, price=Decimal('1.00'),
+            )
+
+    def test_retrieve_me(self):
+        """Test retrieving the authenticated user."""
+        self.assertQueryBudget(1, lambda: self.client.get(ME_URL), self._populate)
+
+    def test_update_me(self):
+        """Test updating the authenticated user."""
+        self.assertQueryBudget(
+            2, lambda: self.client.patch(ME_URL, {'name': 'New Name'}), self._populate,
+        )
+
+    def test_create_user(self):
+        """Test creating a user."""
+        def populate(size):
+            self._populate(size)
+            self.payload = {
+                'email': f'new{size}@example.com',
+                'password': 'testpass123',
+                'name': 'New Name',
+            }
+
+        self.assertQueryBudget(
+            2, lambda: self.client.post(CREATE_USER_URL, self.payload), populate,
+        )
+
+    def test_create_token(self):
+        """Test obtaining a token."""
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+        self.assertQueryBudget(
+            2, lambda: self.client.post(TOKEN_URL, payload), self._populate,
+        )
@@ -1,10 +1,13 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -22,9 +25,14 @@ class CreateTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        user = self.request.user
+        # Saving a copy from the token cache would write its possibly stale
+        # fields back over newer changes.
+        if getattr(user, 'from_token_cache', False):
+            user = get_user_model().objects.get(pk=user.pk)
+        return user